@@ -1,30 +1,535 @@
+import contextlib
+import hashlib
+import io
+import itertools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from openpyxl import load_workbook
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 import warnings
 warnings.filterwarnings('ignore')
 
+# Valores aceitos pelo motor de preços: escalar, array NumPy ou Series do pandas
+Numerico = Union[float, np.ndarray, pd.Series]
+
+# Colunas somadas no relatório e a chave correspondente
+TOTAIS_RELATORIO = {
+    'Quantidade': 'total_itens_comprados',
+    'custo_total_compra': 'custo_total_compra',
+    'custo_fixo_total': 'custo_fixo_total',
+    'custo_total_geral': 'custo_total_geral',
+    'preco_venda_total': 'receita_total_estimada',
+    'lucro_total': 'lucro_total_estimado',
+}
+
+# Formatos de exportação por extensão do arquivo. Os colunares gravam uma tabela
+# por arquivo, sem formatação nem gráficos; CSV aceita compressão pela extensão (.csv.zst)
+EXTENSOES_EXPORTACAO = {'.xlsx': 'xlsx', '.csv': 'csv', '.parquet': 'parquet', '.feather': 'feather'}
+EXTENSOES_COMPRESSAO = {'.gz': 'gzip', '.bz2': 'bz2', '.zst': 'zstd'}
+
+# Colunas opcionais da planilha que acompanham o produto até o resultado,
+# usadas para as quebras do relatório
+COLUNAS_AGRUPAMENTO = ['Categoria', 'Fornecedor']
+
+# Modo compacto: dinheiro em centavos inteiros (int64). Toda divisão segue uma única
+# regra de arredondamento, "meio para cima" (0,5 centavo vai para o centavo de cima).
+COLUNAS_CENTAVOS = [
+    'Custo_Compra_Unitario', 'custo_produto_unitario', 'custo_fixo_alocado_unitario',
+    'custo_total_unitario', 'preco_venda_unitario', 'lucro_unitario', 'preco_venda_total',
+    'lucro_total', 'custo_total_compra', 'custo_fixo_total', 'custo_total_geral', 'preco_sem_arredondamento'
+]
+
+
+def para_centavos(valores: Numerico) -> np.ndarray:
+    # Reais -> centavos, meio para cima. O round(…, 6) elimina ruído de ponto
+    # flutuante (ex.: 4.505 * 100 = 450.49999…) antes de arredondar.
+    centavos = np.round(np.asarray(valores, dtype=float) * 100, 6)
+    return np.floor(centavos + 0.5).astype(np.int64)
+
+
+def centavos_para_reais(df_resultados: pd.DataFrame) -> pd.DataFrame:
+    # Converte um resultado do modo compacto para reais (float), para exibir ou exportar
+    if df_resultados.attrs.get('unidade_monetaria') != 'centavos':
+        return df_resultados
+    colunas = [col for col in COLUNAS_CENTAVOS if col in df_resultados.columns]
+    df = df_resultados.assign(**{col: df_resultados[col] / 100 for col in colunas})
+    df.attrs = {}
+    return df
+
+
+def _custo_compra(produtos: pd.DataFrame) -> np.ndarray:
+    # Custo de compra em reais (float), também para produtos no formato compacto
+    if 'Custo_Compra' not in produtos.columns and 'Custo_Compra_Centavos' in produtos.columns:
+        return produtos['Custo_Compra_Centavos'].to_numpy(dtype=np.int64) / 100
+    return produtos['Custo_Compra'].to_numpy(dtype=float)
+
+
+def _inteiro_enxuto(valores: np.ndarray) -> np.ndarray:
+    # Valores unitários costumam caber em int32; os totais continuam em int64
+    if len(valores) == 0 or (valores.min() >= np.iinfo(np.int32).min and valores.max() <= np.iinfo(np.int32).max):
+        return valores.astype(np.int32)
+    return valores
+
+
+def dividir_arredondando(numerador: Numerico, denominador: Numerico) -> Numerico:
+    # Divisão inteira exata com arredondamento meio para cima (denominador > 0)
+    return (2 * numerador + denominador) // (2 * denominador)
+
+
+# Escada de preços de prateleira: (preço a partir do qual a faixa vale, passo, terminações
+# dentro de cada passo); cada faixa vai até o início da seguinte. Padrão: x,49 e x,99 até
+# R$ 10, x,99 até R$ 100, reais inteiros até R$ 1.000 e dezenas de reais acima disso.
+ESCADA_PADRAO = (
+    (0.0, 1.0, (0.49, 0.99)),
+    (10.0, 1.0, (0.99,)),
+    (100.0, 1.0, (0.0,)),
+    (1000.0, 10.0, (0.0,)),
+)
+
+
+def _montar_escada(escada: Tuple, ate_centavos: int) -> np.ndarray:
+    # Todos os preços permitidos, em centavos e em ordem crescente; a última faixa
+    # se estende até passar de ate_centavos (o maior preço a arredondar)
+    if not escada:
+        raise ValueError("A escada de preços precisa de pelo menos uma faixa")
+    inicios = [int(para_centavos(inicio)) for inicio, _, _ in escada]
+    if any(seguinte <= inicio for inicio, seguinte in zip(inicios, inicios[1:])):
+        raise ValueError("As faixas da escada de preços devem estar em ordem crescente")
+
+    pontos = []
+    for i, (_, passo, terminacoes) in enumerate(escada):
+        passo = int(para_centavos(passo))
+        terminacoes = para_centavos(terminacoes)
+        if passo <= 0 or (terminacoes < 0).any() or (terminacoes >= passo).any():
+            raise ValueError("Cada faixa da escada precisa de passo positivo e terminações menores que o passo")
+        inicio = inicios[i]
+        fim = inicios[i + 1] if i + 1 < len(inicios) else max(ate_centavos, inicio) + passo
+        bases = np.arange(inicio - inicio % passo, fim, passo, dtype=np.int64)
+        faixa = (bases[:, None] + terminacoes).ravel()
+        pontos.append(faixa[(faixa >= inicio) & (faixa < fim)])
+    return np.sort(np.concatenate(pontos))
+
+
+# Custo e quantidade vêm por unidade (Custo_Compra, Quantidade) ou por pacote:
+# custo = Custo_Pacote / Unidades_Pacote e quantidade = Unidades_Pacote * Qtd_Pacotes
+COLUNAS_OBRIGATORIAS = ['Nome_Produto', 'Custo_Compra', 'Quantidade']
+COLUNAS_PACOTE = ['Custo_Pacote', 'Unidades_Pacote', 'Qtd_Pacotes']
+
+
+def _verificar_colunas(colunas) -> None:
+    colunas = set(colunas)
+    por_unidade = {'Custo_Compra', 'Quantidade'} <= colunas
+    por_pacote = {'Custo_Pacote', 'Unidades_Pacote'} <= colunas
+    if 'Nome_Produto' not in colunas or not (por_unidade or por_pacote):
+        raise ValueError(f"O arquivo precisa ter as colunas: {COLUNAS_OBRIGATORIAS} "
+                         f"(ou {COLUNAS_PACOTE} no lugar de custo e quantidade)")
+
+
+# Relatório de validação da carga: uma linha por valor rejeitado ou corrigido.
+# 'linha' é o índice da linha nos dados (0 = primeira linha abaixo do cabeçalho).
+COLUNAS_VALIDACAO = ['linha', 'coluna', 'valor_original', 'motivo']
+
+# Número no formato brasileiro, com sinal e "R$" opcionais: "R$ 1.234,56", "-12,50", "1.234.567"
+PADRAO_NUMERO_BR = r'\s*-?\s*(?:R\$)?\s*-?\s*(?:\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:,\d+)?)\s*'
+# Texto que segue o formato brasileiro mesmo sem vírgula: "R$" ou pontos de milhar
+# ("1.234", "1.234.567"); "12.5" e "0.500" continuam com ponto decimal
+PADRAO_TEXTO_BR = r',|R\$|^\s*-?\s*[1-9]\d{0,2}(?:\.\d{3})+\s*$'
+
+
+def converter_numeros_br(valores: pd.Series) -> pd.Series:
+    # Converte a coluna para número entendendo moeda e decimais no formato brasileiro.
+    # Só os textos passam pelas operações de string (sobre a coluna inteira, sem laço
+    # em Python), então colunas já numéricas custam o mesmo de antes. Textos com vírgula,
+    # "R$" ou pontos de milhar seguem o formato brasileiro; os demais, o to_numeric
+    # (ponto decimal, como em "12.5").
+    if pd.api.types.is_numeric_dtype(valores) and not pd.api.types.is_bool_dtype(valores):
+        return valores
+    if isinstance(valores.dtype, pd.StringDtype):
+        eh_texto = valores.notna().to_numpy(dtype=bool)
+        numeros = np.full(len(valores), np.nan)
+    else:
+        # Colunas mistas (como as lidas do Excel): os valores que não são texto seguem o to_numeric
+        eh_texto = np.fromiter((isinstance(valor, str) for valor in valores), dtype=bool, count=len(valores))
+        if not eh_texto.any():
+            return pd.to_numeric(valores, errors='coerce')
+        numeros = pd.to_numeric(valores.where(~eh_texto), errors='coerce').to_numpy(dtype=float, na_value=np.nan, copy=True)
+
+    texto = valores[eh_texto].astype(str)
+    brasileiro = texto.str.contains(PADRAO_TEXTO_BR, regex=True).to_numpy(dtype=bool, na_value=False)
+    convertidos = np.full(len(texto), np.nan)
+    convertidos[~brasileiro] = pd.to_numeric(texto[~brasileiro], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    # Formato brasileiro, e o que o to_numeric não entendeu (ex.: espaços internos)
+    pendentes = brasileiro | np.isnan(convertidos)
+    if pendentes.any():
+        restante = texto[pendentes]
+        valido = restante.str.fullmatch(PADRAO_NUMERO_BR, case=False)
+        limpo = restante.str.replace(r'[Rr]\$|[\s.-]', '', regex=True).str.replace(',', '.', regex=False)
+        valores_br = pd.to_numeric(limpo.where(valido), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        negativo = restante.str.contains('-', regex=False).to_numpy(dtype=bool)
+        convertidos[pendentes] = np.where(negativo, -valores_br, valores_br)
+    numeros[eh_texto] = convertidos
+    return pd.Series(numeros, index=valores.index)
+
+
+def _problemas_coluna(brutos: pd.Series, convertidos: pd.Series, coluna: str, consequencia: str,
+                      invalido: str = 'valor não numérico') -> pd.DataFrame:
+    # Linhas do relatório de validação para os valores que não viraram número
+    falhas = brutos[convertidos.isna().to_numpy()]
+    vazio = (falhas.isna() | (falhas.astype(str).str.strip() == '')).to_numpy()
+    return pd.DataFrame({
+        'linha': falhas.index,
+        'coluna': coluna,
+        'valor_original': falhas.astype(object).where(~vazio, '').astype(str).to_numpy(),
+        'motivo': np.where(vazio, f'vazio; {consequencia}', f'{invalido}; {consequencia}'),
+    })
+
+# Consolidação de produtos repetidos: grafias de unidade levadas a uma forma só,
+# para que "1L", "1 l" e "1 litro" gerem a mesma chave de produto
+UNIDADES_NOME = [
+    (r'(\d)\s*(?:mililitros?|mls?)\b', r'\1ml'),
+    (r'(\d)\s*(?:litros?|lts?|l)\b', r'\1l'),
+    (r'(\d)\s*(?:quilos?|kilos?|kgs?)\b', r'\1kg'),
+    (r'(\d)\s*(?:gramas?|grs?|g)\b', r'\1g'),
+    (r'(\d)\s*(?:unidades?|unids?|und|un)\b', r'\1un'),
+]
+
+# Milhar no formato brasileiro antes de uma unidade ("1.000g", "1.500,5 ml"): os pontos saem
+# antes de a vírgula virar ponto decimal, como em converter_numeros_br ("1.000" é mil)
+MILHAR_NOME = [
+    (r'(^|[^\d.,])(\d{1,3})\.(\d{3})\.(\d{3})((?:,\d+)?\s*[a-z])', r'\1\2\3\4\5'),
+    (r'(^|[^\d.,])(\d{1,3})\.(\d{3})((?:,\d+)?\s*[a-z])', r'\1\2\3\4'),
+]
+
+# Mapa da consolidação: uma linha por linha de origem ('linha' como em COLUNAS_VALIDACAO),
+# com o produto consolidado em que entrou ('produto', posição no resultado) e a chave usada
+COLUNAS_CONSOLIDACAO = ['linha', 'produto', 'chave', 'Nome_Produto', 'Custo_Compra', 'Quantidade']
+LIMITE_CACHE_NOMES = 1_000_000
+
+
+def normalizar_nomes(nomes: pd.Series) -> pd.Series:
+    # Chave de comparação: sem acentos, minúsculas, decimal com ponto, unidades
+    # padronizadas e espaços/pontuação reduzidos a um espaço. Só operações de coluna.
+    chaves = nomes.astype(str).str.normalize('NFKD').str.replace('[\u0300-\u036f]', '', regex=True).str.lower()
+    for padrao, sem_pontos in MILHAR_NOME:
+        chaves = chaves.str.replace(padrao, sem_pontos, regex=True)
+    chaves = chaves.str.replace(r'(\d),(\d)', r'\1.\2', regex=True)
+    for padrao, unidade in UNIDADES_NOME:
+        chaves = chaves.str.replace(padrao, unidade, regex=True)
+    chaves = chaves.str.replace(r'(\d)\.0+(ml|l|kg|g|un)\b', r'\1\2', regex=True)
+    return chaves.str.replace(r'[^a-z0-9.]+', ' ', regex=True).str.strip()
+
+
+@dataclass(frozen=True)
+class ConfiguracaoPreco:
+    # Fotografia imutável (e hashable) dos parâmetros de preço. Passada ao cálculo,
+    # permite precificar em paralelo sem depender do estado mutável de AnaliseFinanceira.
+    custos_fixos: Tuple[Tuple[str, float], ...]
+    margem_lucro: float
+
+    def __post_init__(self):
+        if not 0 <= self.margem_lucro < 1:
+            raise ValueError("Margem de lucro deve ser um valor entre 0 e 0.99")
+
+    @classmethod
+    def criar(cls, custos_fixos: Dict[str, float], margem_lucro: float) -> 'ConfiguracaoPreco':
+        return cls(tuple(custos_fixos.items()), margem_lucro)
+
+    @property
+    def custo_fixo_mensal_total(self) -> float:
+        return sum(valor for _, valor in self.custos_fixos)
+
+
+@dataclass(frozen=True)
+class _EstadoRazao:
+    # O que já foi ingerido de um razão de compras (planilha que só cresce):
+    # linhas de dados lidas, impressão digital (sha256) delas e, no CSV, o byte onde pararam
+    origem: str
+    colunas: Tuple
+    linhas: int
+    impressao: str
+    posicao: int = 0
+    produtos: pd.DataFrame = field(default=None, compare=False, repr=False)
+
+
+class CacheCatalogos:
+    # Cache em disco dos catálogos já limpos e validados, em Parquet,
+    # indexado pelo hash do conteúdo do arquivo. Remove os menos usados (LRU)
+    # quando o tamanho total passa do limite.
+    VERSAO = '4'  # mudar quando as regras de validação mudarem
+
+    def __init__(self, diretorio: str, limite_bytes: int = 256 * 1024 * 1024):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("O cache de catálogos precisa do pacote 'pyarrow' (pip install pyarrow)")
+        self.diretorio = diretorio
+        self.limite_bytes = limite_bytes
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def chave(self, conteudo: bytes) -> str:
+        return hashlib.sha256(self.VERSAO.encode() + conteudo).hexdigest()
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, f"{chave}.parquet")
+
+    def obter(self, chave: str) -> pd.DataFrame:
+        caminho = self._caminho(chave)
+        with self._lock:
+            if not os.path.exists(caminho):
+                return None
+            # Atualiza o horário de modificação: é ele que define a ordem do LRU
+            os.utime(caminho)
+        try:
+            return pd.read_parquet(caminho)
+        except FileNotFoundError:
+            # Removido por outra thread (limite do cache) entre a checagem e a leitura
+            return None
+
+    def salvar(self, chave: str, df: pd.DataFrame):
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        try:
+            df.to_parquet(temporario)
+        except Exception:
+            # Colunas com tipos misturados não vão para Parquet; apenas não cacheia
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return
+        with self._lock:
+            os.replace(temporario, caminho)
+            self._aplicar_limite()
+
+    def _aplicar_limite(self):
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith('.parquet'):
+                info = os.stat(os.path.join(self.diretorio, nome))
+                arquivos.append((info.st_mtime, info.st_size, nome))
+
+        tamanho_total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, nome in sorted(arquivos):
+            if tamanho_total <= self.limite_bytes:
+                break
+            os.remove(os.path.join(self.diretorio, nome))
+            tamanho_total -= tamanho
+
+    def invalidar(self, chave: str = None):
+        # Sem chave, limpa o cache inteiro
+        with self._lock:
+            if chave is not None:
+                caminho = self._caminho(chave)
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+                return
+            for nome in os.listdir(self.diretorio):
+                if nome.endswith('.parquet'):
+                    os.remove(os.path.join(self.diretorio, nome))
+
+
+# tracemalloc é global ao processo: as etapas que medem memória (de qualquer instância
+# ou thread) dividem o mesmo rastreamento. A primeira liga, a última desliga, e o pico
+# só é zerado depois de repassado a todas as etapas em andamento.
+_LOCK_MEMORIA = threading.Lock()
+_ETAPAS_MEMORIA = {}
+_RASTREIO_PROPRIO = [False]
+
+
+def _repassar_pico():
+    pico = tracemalloc.get_traced_memory()[1]
+    for quadro in _ETAPAS_MEMORIA.values():
+        quadro['pico'] = max(quadro['pico'], pico)
+
+
+class Instrumentacao:
+    # Mede cada etapa (tempo de relógio, linhas e pico de alocação) e emite um
+    # registro de log estruturado por etapa. Ganchos extras recebem o mesmo registro.
+    def __init__(self, medir_memoria: bool = False, logger: logging.Logger = None):
+        self.medir_memoria = medir_memoria
+        self.logger = logger or logging.getLogger('analise_financeira')
+        self.registros = []
+        self.ganchos = []
+        self._lock = threading.Lock()
+
+    def adicionar_gancho(self, gancho):
+        self.ganchos.append(gancho)
+
+    def limpar(self):
+        with self._lock:
+            self.registros = []
+
+    def _iniciar_memoria(self) -> Dict:
+        with _LOCK_MEMORIA:
+            if not _ETAPAS_MEMORIA and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _RASTREIO_PROPRIO[0] = True
+            _repassar_pico()
+            tracemalloc.reset_peak()
+            quadro = {'inicio': tracemalloc.get_traced_memory()[0], 'pico': 0}
+            _ETAPAS_MEMORIA[id(quadro)] = quadro
+            return quadro
+
+    def _finalizar_memoria(self, quadro: Dict) -> int:
+        # O pico inclui o que outras threads alocaram durante a etapa (o rastreamento é do processo)
+        with _LOCK_MEMORIA:
+            _repassar_pico()
+            del _ETAPAS_MEMORIA[id(quadro)]
+            if not _ETAPAS_MEMORIA and _RASTREIO_PROPRIO[0]:
+                tracemalloc.stop()
+                _RASTREIO_PROPRIO[0] = False
+        return max(quadro['pico'] - quadro['inicio'], 0)
+
+    @contextlib.contextmanager
+    def etapa(self, nome: str, **contexto):
+        # O chamador pode completar o registro (ex.: registro['linhas'] = len(df))
+        registro = {'etapa': nome, 'linhas': None, **contexto}
+        quadro = self._iniciar_memoria() if self.medir_memoria else None
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        except Exception as e:
+            registro['erro'] = str(e)
+            raise
+        finally:
+            registro['segundos'] = time.perf_counter() - inicio
+            if quadro is not None:
+                registro['pico_memoria_bytes'] = self._finalizar_memoria(quadro)
+            with self._lock:
+                self.registros.append(registro)
+            self.logger.info("etapa %s: %.4f s", nome, registro['segundos'], extra={'metricas': registro})
+            for gancho in self.ganchos:
+                gancho(registro)
+
+
+def _ler_todas_abas(conteudo: bytes, nome_arquivo: str) -> List[Tuple[str, pd.DataFrame]]:
+    # Executada nos processos do pool: recebe os bytes (serializáveis) e devolve
+    # todas as abas do arquivo. CSV tem uma única "aba", sem nome.
+    if os.path.splitext(nome_arquivo)[1].lower() == '.csv':
+        return [(None, pd.read_csv(io.BytesIO(conteudo)))]
+    abas = pd.read_excel(io.BytesIO(conteudo), sheet_name=None)
+    return list(abas.items())
+
+
+# Simulações de Monte Carlo por tarefa (unidade de trabalho enviada a cada processo)
+SIMULACOES_POR_TAREFA = 10_000
+
+
+def _sortear_triangular(rng: np.random.Generator, minimo: np.ndarray, provavel: np.ndarray,
+                        maximo: np.ndarray, linhas: int) -> np.ndarray:
+    # Distribuição triangular pela inversa da acumulada: aceita parâmetros por coluna
+    # e intervalos degenerados (mínimo = máximo), que o rng.triangular rejeita
+    u = rng.random((linhas, len(minimo)))
+    largura = maximo - minimo
+    corte = np.divide(provavel - minimo, largura, out=np.zeros_like(largura), where=largura > 0)
+    baixo = minimo + np.sqrt(u * largura * (provavel - minimo))
+    alto = maximo - np.sqrt((1 - u) * largura * (maximo - provavel))
+    return np.where(u < corte, baixo, alto)
+
+
+def _simular_receitas(receita_grupos: np.ndarray, minimo: np.ndarray, provavel: np.ndarray, maximo: np.ndarray,
+                      n_simulacoes: int, semente: np.random.SeedSequence, max_elementos_bloco: int) -> np.ndarray:
+    # Executada nos processos do pool: receita vendida em cada simulação de um bloco.
+    # Cada sorteio é a fração vendida de um grupo; a receita é o produto matricial.
+    rng = np.random.default_rng(semente)
+    receitas = np.empty(n_simulacoes)
+    linhas_por_bloco = max(1, max_elementos_bloco // max(len(receita_grupos), 1))
+    for inicio in range(0, n_simulacoes, linhas_por_bloco):
+        fim = min(inicio + linhas_por_bloco, n_simulacoes)
+        receitas[inicio:fim] = _sortear_triangular(rng, minimo, provavel, maximo, fim - inicio) @ receita_grupos
+    return receitas
+
+
+# Maior margem considerada pelo solver de metas (a mesma faixa aceita por definir_margem_lucro)
+MARGEM_MAXIMA = 0.99
+
+
+def _lucro_com_tetos(margens: np.ndarray, custo: np.ndarray, quantidade: np.ndarray,
+                     teto: np.ndarray) -> np.ndarray:
+    # Lucro do lote para cada margem quando o preço de um produto não pode passar do seu teto
+    precos = np.minimum(custo / (1 - margens[:, None]), teto)
+    return (precos - custo) @ quantidade
+
+
 class AnaliseFinanceira:
     def __init__(self):
         self.custos_fixos = {
             'aluguel': 0, 'salario': 0, 'programa': 0,
             'internet': 0, 'contador': 0, 'outros': 0
         }
-        self.produtos = pd.DataFrame()
+        self._produtos = pd.DataFrame()
         self.margem_lucro_desejada = 0.25
+        self.cache = None
+        # Valores rejeitados ou corrigidos na última carga (ver COLUNAS_VALIDACAO)
+        self.relatorio_validacao = pd.DataFrame(columns=COLUNAS_VALIDACAO)
+        # Último lote precificado e seu total de itens (invariante do lote),
+        # usados para reprecificar só as colunas que dependem de custos fixos e margem
+        self.resultados = None
+        self._total_itens_lote = 0
+        # Protege o estado mutável quando a mesma instância é usada por várias threads
+        self._lock = threading.RLock()
+        # Desligada por padrão: sem instrumentação, as etapas não medem nada
+        self.instrumentacao = None
+        # Razão carregado por carregar_incremental (None até a primeira carga)
+        self._razao = None
+        # Linhas de origem de cada produto na última carga consolidada (ver COLUNAS_CONSOLIDACAO)
+        self.mapa_consolidacao = None
+        # Chave normalizada de cada grafia de nome já vista, reaproveitada entre cargas
+        self._chaves_nomes = {}
+
+    @property
+    def produtos(self) -> pd.DataFrame:
+        return self._produtos
+
+    @produtos.setter
+    def produtos(self, df: pd.DataFrame):
+        # Lote novo: os resultados guardados são de outro lote e não podem ser reprecificados
+        with self._lock:
+            self._produtos = df
+            self.resultados = None
+            self._total_itens_lote = 0
         
     def definir_custos_fixos(self, custos: Dict[str, float]):
-        self.custos_fixos.update(custos)
+        with self._lock:
+            anteriores = dict(self.custos_fixos)
+            self.custos_fixos.update(custos)
+            if self.custos_fixos != anteriores:
+                self._reprecificar()
 
     def definir_margem_lucro(self, margem: float):
         if 0 <= margem < 1:
-            self.margem_lucro_desejada = margem
+            with self._lock:
+                alterou = margem != self.margem_lucro_desejada
+                self.margem_lucro_desejada = margem
+                if alterou:
+                    self._reprecificar()
         else:
             raise ValueError("Margem de lucro deve ser um valor entre 0 e 0.99")
 
-    def calcular_preco_venda(self, custo_produto: float, custo_fixo_por_produto: float) -> Dict:
+    def configuracao(self) -> ConfiguracaoPreco:
+        with self._lock:
+            return ConfiguracaoPreco.criar(self.custos_fixos, self.margem_lucro_desejada)
+
+    def aplicar_configuracao(self, configuracao: ConfiguracaoPreco):
+        with self._lock:
+            self.custos_fixos = dict(configuracao.custos_fixos)
+            self.margem_lucro_desejada = configuracao.margem_lucro
+            self._reprecificar()
+
+    def calcular_preco_venda(self, custo_produto: Numerico, custo_fixo_por_produto: Numerico,
+                             configuracao: Optional[ConfiguracaoPreco] = None) -> Dict:
+        # Funciona tanto para um produto quanto para colunas inteiras (arrays/Series),
+        # pois usa apenas operações aritméticas elemento a elemento.
+        margem = self.margem_lucro_desejada if configuracao is None else configuracao.margem_lucro
         custo_total_unitario = custo_produto + custo_fixo_por_produto
-        preco_venda_unitario = custo_total_unitario / (1 - self.margem_lucro_desejada)
+        preco_venda_unitario = custo_total_unitario / (1 - margem)
         lucro_unitario = preco_venda_unitario - custo_total_unitario
         
         return {
@@ -35,92 +540,876 @@ class AnaliseFinanceira:
             'lucro_unitario': lucro_unitario,
         }
     
-    def carregar_produtos_excel(self, arquivo: str) -> pd.DataFrame:
-        try:
-            df = pd.read_excel(arquivo)
-            required_columns = ['Nome_Produto', 'Custo_Compra', 'Quantidade']
-            if not all(col in df.columns for col in required_columns):
-                raise ValueError(f"O arquivo precisa ter as colunas: {required_columns}")
-            df['Custo_Compra'] = pd.to_numeric(df['Custo_Compra'], errors='coerce')
-            df['Quantidade'] = pd.to_numeric(df['Quantidade'], errors='coerce').fillna(1)
-            df = df.dropna(subset=['Custo_Compra'])
-            self.produtos = df
-            return df
-        except Exception as e:
-            raise Exception(f"Erro ao carregar arquivo Excel: {str(e)}")
-    
-    def calcular_preco_lote(self) -> pd.DataFrame:
-        if self.produtos.empty:
+    def validar_produtos(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # Devolve os produtos limpos e o relatório de validação (linha, coluna, valor, motivo)
+        _verificar_colunas(df.columns)
+        custo, quantidade, relatorio = self._custo_e_quantidade(df)
+        df = df.assign(Custo_Compra=custo, Quantidade=quantidade.fillna(1))
+        return df.dropna(subset=['Custo_Compra']), relatorio
+
+    def _custo_e_quantidade(self, df: pd.DataFrame) -> Tuple[pd.Series, pd.Series, pd.DataFrame]:
+        # Custo unitário e quantidade de todas as linhas de uma vez. Linhas com pacote
+        # válido (Custo_Pacote e Unidades_Pacote > 0) usam o pacote; as demais, os
+        # valores por unidade. Qtd_Pacotes vazia conta como um pacote.
+        vazia = pd.Series(np.nan, index=df.index)
+        brutos_custo = df['Custo_Compra'] if 'Custo_Compra' in df.columns else vazia
+        brutos_quantidade = df['Quantidade'] if 'Quantidade' in df.columns else vazia
+        custo = converter_numeros_br(brutos_custo)
+        quantidade = converter_numeros_br(brutos_quantidade)
+
+        problemas_pacote = []
+        if 'Custo_Pacote' in df.columns and 'Unidades_Pacote' in df.columns:
+            custo_pacote = converter_numeros_br(df['Custo_Pacote'])
+            unidades = converter_numeros_br(df['Unidades_Pacote'])
+            unidades = unidades.where(unidades > 0)
+            pacotes = converter_numeros_br(df['Qtd_Pacotes']) if 'Qtd_Pacotes' in df.columns else vazia
+
+            com_pacote = custo_pacote.notna().to_numpy()
+            por_pacote = com_pacote & unidades.notna().to_numpy()
+            custo = custo.mask(por_pacote, custo_pacote / unidades)
+            quantidade = quantidade.mask(por_pacote, unidades * pacotes.fillna(1))
+
+            problemas_pacote.append(_problemas_coluna(
+                df['Unidades_Pacote'][com_pacote], unidades[com_pacote], 'Unidades_Pacote', 'pacote ignorado',
+                invalido='valor não numérico ou não positivo'))
+            if 'Qtd_Pacotes' in df.columns:
+                problemas_pacote.append(_problemas_coluna(
+                    df['Qtd_Pacotes'][por_pacote], pacotes[por_pacote], 'Qtd_Pacotes', 'assumido 1 pacote'))
+
+        relatorio = pd.concat([
+            _problemas_coluna(brutos_custo, custo, 'Custo_Compra', 'linha descartada'),
+            _problemas_coluna(brutos_quantidade, quantidade, 'Quantidade', 'assumida quantidade 1'),
+            *problemas_pacote,
+        ], ignore_index=True).sort_values('linha', kind='stable', ignore_index=True)
+        return custo, quantidade, relatorio
+
+    def _validar_produtos(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.validar_produtos(df)[0]
+
+    def _chaves_produtos(self, nomes: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        # Código do produto de cada linha e as chaves normalizadas, na ordem em que aparecem.
+        # Cada grafia distinta é normalizada uma vez só; as já vistas saem do cache.
+        codigos, grafias = pd.factorize(nomes.astype(str))
+        with self._lock:
+            chaves = grafias.map(self._chaves_nomes).to_numpy(dtype=object)
+        novas = pd.isna(chaves)
+        if novas.any():
+            # Normaliza fora do lock, em cópia local; o cache compartilhado só é tocado sob o lock
+            normalizadas = normalizar_nomes(pd.Series(grafias[novas], dtype=str)).to_numpy(dtype=object)
+            chaves[novas] = normalizadas
+            with self._lock:
+                if len(self._chaves_nomes) + len(normalizadas) > LIMITE_CACHE_NOMES:
+                    self._chaves_nomes = {}
+                self._chaves_nomes.update(zip(grafias[novas], normalizadas))
+        # Grafias já vêm na ordem de aparição, então as chaves também
+        codigos_chave, unicas = pd.factorize(chaves)
+        return codigos_chave[codigos], unicas
+
+    def consolidar_produtos(self, produtos: pd.DataFrame = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # Junta as linhas do mesmo produto (mesma chave normalizada do nome) em uma só:
+        # quantidades somadas e custo médio ponderado pela quantidade (média simples se
+        # o produto não tiver itens). As demais colunas, e o nome, vêm da primeira linha.
+        # Agrupamento por hash (factorize, sem ordenar) e somas por grupo com bincount.
+        produtos = self.produtos if produtos is None else produtos
+        codigos, chaves = self._chaves_produtos(produtos['Nome_Produto'])
+        n_produtos = len(chaves)
+
+        custo = _custo_compra(produtos)
+        quantidade = produtos['Quantidade'].to_numpy(dtype=float)
+        linhas = np.bincount(codigos, minlength=n_produtos)
+        itens = np.bincount(codigos, weights=quantidade, minlength=n_produtos)
+        media_simples = np.bincount(codigos, weights=custo, minlength=n_produtos) / np.maximum(linhas, 1)
+        gasto = np.bincount(codigos, weights=custo * quantidade, minlength=n_produtos)
+        custo_medio = np.divide(gasto, itens, out=media_simples, where=itens != 0)
+
+        # factorize numera as chaves na ordem em que aparecem: a primeira linha de cada
+        # código é a primeira ocorrência não duplicada
+        primeiras = np.flatnonzero(~pd.Series(codigos).duplicated().to_numpy())
+        if 'Custo_Compra_Centavos' in produtos.columns and 'Custo_Compra' not in produtos.columns:
+            # Formato compacto continua compacto: custo médio em centavos, quantidade inteira
+            colunas = {'Custo_Compra_Centavos': para_centavos(custo_medio),
+                       'Quantidade': _inteiro_enxuto(np.round(itens).astype(np.int64))}
+        else:
+            colunas = {'Custo_Compra': custo_medio, 'Quantidade': itens}
+        consolidado = produtos.iloc[primeiras].assign(**colunas, Linhas_Origem=linhas).reset_index(drop=True)
+        mapa = pd.DataFrame({
+            'linha': produtos.index.to_numpy(),
+            'produto': codigos,
+            'chave': chaves[codigos],
+            'Nome_Produto': produtos['Nome_Produto'].to_numpy(),
+            'Custo_Compra': custo,
+            'Quantidade': quantidade,
+        }, columns=COLUNAS_CONSOLIDACAO)
+        return consolidado, mapa
+
+    def ativar_instrumentacao(self, medir_memoria: bool = False,
+                              instrumentacao: Instrumentacao = None) -> Instrumentacao:
+        self.instrumentacao = instrumentacao or Instrumentacao(medir_memoria)
+        return self.instrumentacao
+
+    def _medir(self, etapa: str):
+        if self.instrumentacao is None:
+            return contextlib.nullcontext({})
+        return self.instrumentacao.etapa(etapa)
+
+    def ativar_cache(self, diretorio: str, limite_bytes: int = 256 * 1024 * 1024):
+        self.cache = CacheCatalogos(diretorio, limite_bytes)
+
+    def invalidar_cache(self, arquivo=None):
+        # Sem arquivo, limpa o cache inteiro; com arquivo, só a entrada dele
+        if self.cache is None:
+            return
+        chave = self.cache.chave(self._ler_bytes(arquivo)) if arquivo is not None else None
+        self.cache.invalidar(chave)
+
+    def _ler_bytes(self, arquivo) -> bytes:
+        # Aceita caminho ou objeto de arquivo (ex.: upload do Streamlit)
+        if isinstance(arquivo, (str, os.PathLike)):
+            with open(arquivo, 'rb') as f:
+                return f.read()
+        if hasattr(arquivo, 'getvalue'):
+            return arquivo.getvalue()
+        posicao = arquivo.tell()
+        conteudo = arquivo.read()
+        arquivo.seek(posicao)
+        return conteudo
+
+    def carregar_produtos_excel(self, arquivo: str, consolidar: bool = False, compacto: bool = False) -> pd.DataFrame:
+        # Com consolidar, linhas repetidas do mesmo produto viram uma só (ver consolidar_produtos)
+        # e a origem de cada uma fica em self.mapa_consolidacao. Com compacto, self.produtos
+        # guarda só o formato de compactar_produtos (o cache em disco continua no formato completo).
+        with self._medir('carregar') as medida:
+            try:
+                chave = None
+                if self.cache is not None:
+                    conteudo = self._ler_bytes(arquivo)
+                    chave = self.cache.chave(conteudo)
+                    df = self.cache.obter(chave)
+                    # O relatório de validação viaja nos metadados do próprio Parquet
+                    # (df.attrs, gravados pelo pandas a partir da 2.1; ver requirements.txt)
+                    validacao = df.attrs.pop('validacao', None) if df is not None else None
+                    if validacao is not None:
+                        relatorio = pd.DataFrame(validacao, columns=COLUNAS_VALIDACAO)
+                        df, mapa = self.consolidar_produtos(df) if consolidar else (df, None)
+                        df = self.compactar_produtos(df) if compacto else df
+                        with self._lock:
+                            self.produtos = df
+                            self.relatorio_validacao = relatorio
+                            self.mapa_consolidacao = mapa
+                        medida.update(linhas=len(df), cache=True)
+                        return df
+                    arquivo = io.BytesIO(conteudo)
+
+                df = pd.read_excel(arquivo)
+                df, relatorio = self.validar_produtos(df)
+                if chave is not None:
+                    cacheado = df.copy(deep=False)
+                    cacheado.attrs = {'validacao': relatorio.to_dict(orient='list')}
+                    self.cache.salvar(chave, cacheado)
+                df, mapa = self.consolidar_produtos(df) if consolidar else (df, None)
+                df = self.compactar_produtos(df) if compacto else df
+                with self._lock:
+                    self.produtos = df
+                    self.relatorio_validacao = relatorio
+                    self.mapa_consolidacao = mapa
+                medida['rejeitados'] = int((relatorio['coluna'] == 'Custo_Compra').sum())
+                medida['linhas'] = len(df)
+                return df
+            except Exception as e:
+                raise Exception(f"Erro ao carregar arquivo Excel: {str(e)}")
+
+    def compactar_produtos(self, produtos: pd.DataFrame = None) -> pd.DataFrame:
+        # Nomes como categoria, custo em centavos (int64) e quantidade inteira (int32 se couber).
+        # Quantidades fracionárias (produtos pesados) não são arredondadas: são recusadas.
+        produtos = self.produtos if produtos is None else produtos
+        quantidade = produtos['Quantidade'].to_numpy(dtype=float)
+        inteira = np.round(quantidade)
+        fracionaria = ~np.isclose(quantidade, inteira, rtol=0, atol=1e-9)
+        if fracionaria.any():
+            linhas = produtos.index[fracionaria]
+            exemplos = ', '.join(f"linha {linha}: {valor:g}" for linha, valor in zip(linhas[:5], quantidade[fracionaria][:5]))
+            raise ValueError(f"O modo compacto precisa de quantidades inteiras; {fracionaria.sum()} linha(s) "
+                             f"com quantidade fracionária ({exemplos}). Use calcular_preco_lote para esses produtos.")
+        compacto = pd.DataFrame({
+            'Nome_Produto': produtos['Nome_Produto'].astype('category'),
+            'Custo_Compra_Centavos': para_centavos(produtos['Custo_Compra']),
+            'Quantidade': _inteiro_enxuto(inteira.astype(np.int64)),
+        }, index=produtos.index)
+        for coluna in COLUNAS_AGRUPAMENTO:
+            if coluna in produtos.columns:
+                compacto[coluna] = produtos[coluna].astype('category')
+        if 'Preco_Maximo' in produtos.columns:
+            compacto['Preco_Maximo'] = converter_numeros_br(produtos['Preco_Maximo'])
+        return compacto
+
+    def calcular_preco_lote_centavos(self, configuracao: Optional[ConfiguracaoPreco] = None) -> pd.DataFrame:
+        # Mesmas colunas de calcular_preco_lote, com valores em centavos inteiros e
+        # aritmética inteira exata: os totais são reproduzíveis em qualquer máquina.
+        # A margem é usada em pontos-base (0,01%).
+        with self._lock:
+            produtos = self.produtos
+            config = configuracao if configuracao is not None else self.configuracao()
+
+        if produtos.empty:
             raise ValueError("Nenhum produto carregado.")
-        
-        custo_fixo_mensal_total = sum(self.custos_fixos.values())
+        if 'Custo_Compra_Centavos' not in produtos.columns:
+            produtos = self.compactar_produtos(produtos)
+
+        with self._medir('precificar') as medida:
+            custo_compra = produtos['Custo_Compra_Centavos'].to_numpy(dtype=np.int64)
+            quantidade = produtos['Quantidade'].to_numpy(dtype=np.int64)
+            total_itens_lote = int(quantidade.sum())
+
+            custos_fixos = [valor for _, valor in config.custos_fixos]
+            custo_fixo_mensal = int(para_centavos(custos_fixos).sum()) if custos_fixos else 0
+            custo_fixo_diario = dividir_arredondando(custo_fixo_mensal, 30)
+            custo_fixo_unitario = dividir_arredondando(custo_fixo_diario, total_itens_lote) if total_itens_lote > 0 else 0
+            margem_pontos_base = int(round(config.margem_lucro * 10000))
+
+            custo_fixo_alocado = np.full(len(custo_compra), custo_fixo_unitario, dtype=np.int64)
+            custo_total_unitario = custo_compra + custo_fixo_alocado
+            preco_venda_unitario = dividir_arredondando(custo_total_unitario * 10000, 10000 - margem_pontos_base)
+            lucro_unitario = preco_venda_unitario - custo_total_unitario
+
+            df = pd.DataFrame({
+                'Nome_Produto': produtos['Nome_Produto'].to_numpy(),
+                'Custo_Compra_Unitario': _inteiro_enxuto(custo_compra),
+                'Quantidade': produtos['Quantidade'].to_numpy(),
+                'custo_produto_unitario': _inteiro_enxuto(custo_compra),
+                'custo_fixo_alocado_unitario': _inteiro_enxuto(custo_fixo_alocado),
+                'custo_total_unitario': _inteiro_enxuto(custo_total_unitario),
+                'preco_venda_unitario': _inteiro_enxuto(preco_venda_unitario),
+                'lucro_unitario': _inteiro_enxuto(lucro_unitario),
+                'preco_venda_total': preco_venda_unitario * quantidade,
+                'lucro_total': lucro_unitario * quantidade,
+                'custo_total_compra': custo_compra * quantidade,
+                'custo_fixo_total': custo_fixo_alocado * quantidade,
+                'custo_total_geral': custo_total_unitario * quantidade,
+            })
+            df['Nome_Produto'] = df['Nome_Produto'].astype(produtos['Nome_Produto'].dtype)
+            for coluna in COLUNAS_AGRUPAMENTO:
+                if coluna in produtos.columns:
+                    df[coluna] = produtos[coluna].to_numpy()
+            df.attrs['unidade_monetaria'] = 'centavos'
+            medida['linhas'] = len(df)
+        return df
+
+    def centavos_para_reais(self, df_resultados: pd.DataFrame) -> pd.DataFrame:
+        return centavos_para_reais(df_resultados)
+
+    def carregar_varios_arquivos(self, arquivos: List, max_processos: int = None,
+                                 usar_processos: bool = True, mp_context=None) -> pd.DataFrame:
+        # Lê vários arquivos (e todas as abas de cada um) em paralelo, valida cada aba
+        # com as mesmas regras de carregar_produtos_excel e junta tudo em self.produtos,
+        # registrando a origem em Arquivo_Origem e Aba_Origem. mp_context (ex.: spawn ou
+        # forkserver) evita fork a partir de processos com várias threads, como um servidor web.
+        with self._medir('carregar') as medida:
+            try:
+                nomes = []
+                conteudos = []
+                for i, arquivo in enumerate(arquivos):
+                    if isinstance(arquivo, (str, os.PathLike)):
+                        nomes.append(os.path.basename(arquivo))
+                    else:
+                        nomes.append(os.path.basename(getattr(arquivo, 'name', None) or f'arquivo_{i + 1}.xlsx'))
+                    conteudos.append(self._ler_bytes(arquivo))
+
+                if len(conteudos) == 1:
+                    lidos = [_ler_todas_abas(conteudos[0], nomes[0])]
+                else:
+                    # Ler xlsx é trabalho de CPU em Python: processos escalam melhor que threads
+                    if usar_processos:
+                        executor = ProcessPoolExecutor(max_workers=max_processos, mp_context=mp_context)
+                    else:
+                        executor = ThreadPoolExecutor(max_workers=max_processos)
+                    with executor:
+                        lidos = list(executor.map(_ler_todas_abas, conteudos, nomes))
+
+                partes = []
+                relatorios = []
+                for nome_arquivo, abas in zip(nomes, lidos):
+                    for aba, df in abas:
+                        if df.empty and len(df.columns) == 0:
+                            continue
+                        try:
+                            df, relatorio = self.validar_produtos(df)
+                        except ValueError as e:
+                            local = nome_arquivo if aba is None else f"{nome_arquivo} (aba {aba})"
+                            raise ValueError(f"{local}: {e}")
+                        partes.append(df.assign(Arquivo_Origem=nome_arquivo, Aba_Origem=aba))
+                        relatorios.append(relatorio.assign(Arquivo_Origem=nome_arquivo, Aba_Origem=aba))
+
+                if not partes:
+                    raise ValueError("Nenhuma aba com produtos foi encontrada.")
+                df = pd.concat(partes, ignore_index=True)
+                relatorio = pd.concat(relatorios, ignore_index=True)
+                with self._lock:
+                    self.produtos = df
+                    self.relatorio_validacao = relatorio
+                    self.mapa_consolidacao = None
+                medida.update(linhas=len(df), arquivos=len(nomes))
+                return df
+            except Exception as e:
+                raise Exception(f"Erro ao carregar arquivo Excel: {str(e)}")
+
+    def carregar_incremental(self, arquivo) -> pd.DataFrame:
+        # Para razões de compras que só crescem no mês: as linhas já ingeridas são
+        # conferidas pela impressão digital e só a cauda nova é lida, validada e
+        # precificada. Se o começo do arquivo mudou, recarrega tudo. Devolve só os produtos novos.
+        with self._medir('carregar') as medida:
+            try:
+                conteudo = self._ler_bytes(arquivo)
+                if isinstance(arquivo, (str, os.PathLike)):
+                    origem = os.path.abspath(arquivo)
+                else:
+                    origem = getattr(arquivo, 'name', None) or ''
+                ler_cauda = self._ler_cauda_csv if origem.lower().endswith('.csv') else self._ler_cauda_xlsx
+
+                with self._lock:
+                    estado = self._razao
+                if estado is not None and (estado.origem != origem or estado.produtos is not self.produtos):
+                    estado = None
+                leitura = ler_cauda(conteudo, estado) if estado is not None else None
+                incremental = leitura is not None
+                if not incremental:
+                    leitura = ler_cauda(conteudo, None)
+                df_novos, campos = leitura
+
+                # Índice = posição da linha nos dados, como em carregar_produtos_excel
+                anteriores = estado.linhas if incremental else 0
+                df_novos.index = pd.RangeIndex(anteriores, anteriores + len(df_novos))
+                novos, relatorio = self.validar_produtos(df_novos)
+
+                with self._lock:
+                    if incremental:
+                        # Mesmo lote com linhas a mais: mantém os resultados para acrescentar
+                        self._produtos = pd.concat([self._produtos, novos])
+                        self.relatorio_validacao = pd.concat([self.relatorio_validacao, relatorio], ignore_index=True)
+                        self._acrescentar_resultados(novos)
+                    else:
+                        self.produtos = novos
+                        self.relatorio_validacao = relatorio
+                        self.mapa_consolidacao = None
+                    self._razao = _EstadoRazao(origem=origem, produtos=self.produtos, **campos)
+                medida.update(linhas=len(novos), incremental=incremental)
+                return novos
+            except Exception as e:
+                raise Exception(f"Erro ao carregar arquivo Excel: {str(e)}")
+
+    def _ler_cauda_csv(self, conteudo: bytes, estado: Optional[_EstadoRazao]) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        # Confere o hash dos bytes já lidos e interpreta só os bytes acrescentados.
+        # Devolve None se o começo do arquivo não é mais o mesmo.
+        if estado is None:
+            df = pd.read_csv(io.BytesIO(conteudo))
+            campos = {'colunas': tuple(df.columns), 'linhas': len(df), 'posicao': len(conteudo)}
+            return df, {**campos, 'impressao': hashlib.sha256(conteudo).hexdigest()}
+
+        prefixo, cauda = conteudo[:estado.posicao], conteudo[estado.posicao:]
+        impressao = hashlib.sha256(prefixo)
+        if len(prefixo) < estado.posicao or impressao.hexdigest() != estado.impressao:
+            return None
+        # Última linha sem quebra de linha que continuou a ser digitada: não é só um acréscimo
+        if cauda and not prefixo.endswith(b'\n') and not cauda.startswith((b'\n', b'\r')):
+            return None
+
+        colunas = list(estado.colunas)
+        if cauda.strip():
+            df = pd.read_csv(io.BytesIO(cauda), header=None, names=colunas)
+        else:
+            df = pd.DataFrame(columns=colunas)
+        impressao.update(cauda)
+        campos = {'colunas': estado.colunas, 'linhas': estado.linhas + len(df), 'posicao': len(conteudo)}
+        return df, {**campos, 'impressao': impressao.hexdigest()}
+
+    def _ler_cauda_xlsx(self, conteudo: bytes, estado: Optional[_EstadoRazao]) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        # O xlsx é compactado, então a leitura somente-leitura percorre o arquivo todo,
+        # mas as linhas já ingeridas só entram no hash: não viram DataFrame, nem são
+        # validadas ou precificadas de novo. Devolve None se alguma delas mudou.
+        workbook = load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
+        try:
+            linhas = workbook.worksheets[0].iter_rows(values_only=True)
+            cabecalho = tuple(next(linhas, ()))
+            impressao = hashlib.sha256(repr(cabecalho).encode())
+
+            anteriores = 0
+            if estado is not None:
+                if cabecalho != estado.colunas:
+                    return None
+                for linha in itertools.islice(linhas, estado.linhas):
+                    impressao.update(repr(linha).encode())
+                    anteriores += 1
+                if anteriores < estado.linhas or impressao.hexdigest() != estado.impressao:
+                    return None
+
+            novas = list(linhas)
+            # Linhas vazias no fim da aba (formatação) ainda não fazem parte do razão
+            while novas and all(valor is None for valor in novas[-1]):
+                novas.pop()
+            for linha in novas:
+                impressao.update(repr(linha).encode())
+        finally:
+            workbook.close()
+
+        nomes = [col if col is not None else f'Unnamed: {i}' for i, col in enumerate(cabecalho)]
+        df = pd.DataFrame([linha[:len(nomes)] for linha in novas], columns=nomes)
+        return df, {'colunas': cabecalho, 'linhas': anteriores + len(novas), 'impressao': impressao.hexdigest()}
+
+    def _acrescentar_resultados(self, novos: pd.DataFrame):
+        # Precifica só os produtos novos. Nos antigos, o total de itens maior muda apenas
+        # o rateio do custo fixo, refeito em poucas operações de coluna (_reprecificar).
+        if self.resultados is None:
+            return
+        total_anterior = self._total_itens_lote
+        self._total_itens_lote = total_anterior + novos['Quantidade'].sum()
+        custo_fixo_por_produto = self._custo_fixo_por_produto(self._total_itens_lote)
+        self.resultados = pd.concat([self.resultados, self._precificar(novos, custo_fixo_por_produto)],
+                                    ignore_index=True)
+        if self._total_itens_lote != total_anterior:
+            self._reprecificar()
+
+    def _custo_fixo_por_produto(self, total_itens_lote: float,
+                                configuracao: Optional[ConfiguracaoPreco] = None) -> float:
+        if configuracao is None:
+            custo_fixo_mensal_total = sum(self.custos_fixos.values())
+        else:
+            custo_fixo_mensal_total = configuracao.custo_fixo_mensal_total
         custo_fixo_diario = custo_fixo_mensal_total / 30
-        total_itens_lote = self.produtos['Quantidade'].sum()
 
         if total_itens_lote > 0:
-            custo_fixo_por_produto = custo_fixo_diario / total_itens_lote
-        else:
-            custo_fixo_por_produto = 0
-
-        resultados = []
-        for _, produto in self.produtos.iterrows():
-            info_preco = self.calcular_preco_venda(produto['Custo_Compra'], custo_fixo_por_produto)
-            resultado = {
-                'Nome_Produto': produto['Nome_Produto'],
-                'Custo_Compra_Unitario': produto['Custo_Compra'],
-                'Quantidade': produto['Quantidade'],
-                **info_preco
-            }
-            resultados.append(resultado)
-        
-        df = pd.DataFrame(resultados)
+            return custo_fixo_diario / total_itens_lote
+        return 0
+
+    def _precificar(self, produtos: pd.DataFrame, custo_fixo_por_produto: float,
+                    configuracao: Optional[ConfiguracaoPreco] = None) -> pd.DataFrame:
+        # Cálculo colunar: todas as colunas derivadas saem de poucas operações vetorizadas
+        custo_compra = _custo_compra(produtos)
+        quantidade = produtos['Quantidade'].to_numpy()
+        custo_fixo_alocado = np.full(len(custo_compra), custo_fixo_por_produto)
+        info_preco = self.calcular_preco_venda(custo_compra, custo_fixo_alocado, configuracao)
+
+        df = pd.DataFrame({
+            'Nome_Produto': produtos['Nome_Produto'].to_numpy(),
+            'Custo_Compra_Unitario': custo_compra,
+            'Quantidade': quantidade,
+            **info_preco
+        })
         df['preco_venda_total'] = df['preco_venda_unitario'] * df['Quantidade']
         df['lucro_total'] = df['lucro_unitario'] * df['Quantidade']
         df['custo_total_compra'] = df['custo_produto_unitario'] * df['Quantidade']
         df['custo_fixo_total'] = df['custo_fixo_alocado_unitario'] * df['Quantidade']
         df['custo_total_geral'] = df['custo_total_unitario'] * df['Quantidade']
+        for coluna in COLUNAS_AGRUPAMENTO:
+            if coluna in produtos.columns:
+                df[coluna] = produtos[coluna].to_numpy()
         return df
 
-    def gerar_relatorio(self, df_resultados: pd.DataFrame) -> Dict:
-        return {
-            'total_produtos_diferentes': len(df_resultados),
-            'total_itens_comprados': df_resultados['Quantidade'].sum(),
-            'custo_total_compra': df_resultados['custo_total_compra'].sum(),
-            'custo_fixo_total': df_resultados['custo_fixo_total'].sum(),
-            'custo_total_geral': df_resultados['custo_total_geral'].sum(),
-            'receita_total_estimada': df_resultados['preco_venda_total'].sum(),
-            'lucro_total_estimado': df_resultados['lucro_total'].sum(),
+    def calcular_preco_lote(self, configuracao: Optional[ConfiguracaoPreco] = None) -> pd.DataFrame:
+        # Com uma configuração explícita o cálculo não lê nem altera o estado da instância;
+        # sem ela, usa uma fotografia da configuração atual e guarda o lote precificado.
+        with self._lock:
+            produtos = self.produtos
+            config = configuracao if configuracao is not None else self.configuracao()
+
+        if produtos.empty:
+            raise ValueError("Nenhum produto carregado.")
+
+        with self._medir('precificar') as medida:
+            total_itens_lote = produtos['Quantidade'].sum()
+            custo_fixo_por_produto = self._custo_fixo_por_produto(total_itens_lote, config)
+            df = self._precificar(produtos, custo_fixo_por_produto, config)
+            medida['linhas'] = len(df)
+
+        if configuracao is None:
+            with self._lock:
+                # Só guarda se ninguém trocou o lote ou a configuração durante o cálculo
+                if self.produtos is produtos and self.configuracao() == config:
+                    self.resultados = df
+                    self._total_itens_lote = total_itens_lote
+        return df
+
+    def aplicar_escada_precos(self, df_resultados: pd.DataFrame, escada: Tuple = ESCADA_PADRAO) -> pd.DataFrame:
+        # Etapa opcional depois de calcular_preco_lote: leva cada preço sugerido ao menor preço
+        # de prateleira da escada que não fique abaixo dele, então a margem nunca cai. Busca
+        # binária (searchsorted) na escada ordenada, em centavos; lucro e totais são recalculados
+        # e o preço calculado fica em preco_sem_arredondamento. Funciona também no modo centavos.
+        centavos = df_resultados.attrs.get('unidade_monetaria') == 'centavos'
+        coluna_original = ('preco_sem_arredondamento' if 'preco_sem_arredondamento' in df_resultados.columns
+                           else 'preco_venda_unitario')
+        preco_original = df_resultados[coluna_original].to_numpy()
+        if centavos:
+            preco_centavos = preco_original.astype(np.int64)
+        else:
+            # Arredonda para cima, tolerando ruído de ponto flutuante (7,49 calculado como 7,4900000001)
+            preco_centavos = np.ceil(np.round(preco_original.astype(float) * 100, 6)).astype(np.int64)
+
+        pontos = _montar_escada(escada, int(preco_centavos.max()) if len(preco_centavos) else 0)
+        preco = pontos[np.searchsorted(pontos, preco_centavos, side='left')]
+        if centavos:
+            quantidade = df_resultados['Quantidade'].to_numpy(dtype=np.int64)
+            lucro = preco - df_resultados['custo_total_unitario'].to_numpy(dtype=np.int64)
+            unitarios = {'preco_venda_unitario': _inteiro_enxuto(preco), 'lucro_unitario': _inteiro_enxuto(lucro)}
+        else:
+            quantidade = df_resultados['Quantidade'].to_numpy(dtype=float)
+            preco = preco / 100
+            lucro = preco - df_resultados['custo_total_unitario'].to_numpy(dtype=float)
+            unitarios = {'preco_venda_unitario': preco, 'lucro_unitario': lucro}
+
+        return df_resultados.assign(
+            **unitarios,
+            preco_venda_total=preco * quantidade,
+            lucro_total=lucro * quantidade,
+            preco_sem_arredondamento=preco_original,
+        )
+
+    def _reprecificar(self):
+        # Recalcula só as colunas que dependem de custos fixos e margem;
+        # custo de compra, quantidade e o total de itens do lote não mudam.
+        # O DataFrame é substituído (assign), nunca alterado no lugar.
+        if self.resultados is None:
+            return
+
+        df = self.resultados
+        quantidade = df['Quantidade'].to_numpy()
+        custo_fixo_por_produto = self._custo_fixo_por_produto(self._total_itens_lote)
+        custo_fixo_alocado = np.full(len(df), custo_fixo_por_produto)
+        info_preco = self.calcular_preco_venda(df['custo_produto_unitario'].to_numpy(), custo_fixo_alocado)
+
+        self.resultados = df.assign(
+            custo_fixo_alocado_unitario=custo_fixo_alocado,
+            custo_total_unitario=info_preco['custo_total_unitario'],
+            preco_venda_unitario=info_preco['preco_venda_unitario'],
+            lucro_unitario=info_preco['lucro_unitario'],
+            preco_venda_total=info_preco['preco_venda_unitario'] * quantidade,
+            lucro_total=info_preco['lucro_unitario'] * quantidade,
+            custo_fixo_total=custo_fixo_alocado * quantidade,
+            custo_total_geral=info_preco['custo_total_unitario'] * quantidade,
+        )
+
+    def simular_cenarios(self, margens: Numerico, custos_fixos_totais: Numerico, volumes: Numerico = None,
+                         por_produto: bool = True, max_elementos_bloco: int = 1_000_000) -> Dict:
+        # Varredura de cenários "e se": cada combinação margem × custo fixo mensal × volume
+        # esperado (itens sobre os quais o custo fixo diário é rateado) em uma só passada.
+        # Totais saem em forma fechada, com shape (margens, custos, volumes); com por_produto,
+        # preço, receita e lucro por produto formam cubos (margens, custos, volumes, produtos),
+        # preenchidos em blocos de cenários para limitar a memória temporária.
+        if self.produtos.empty:
+            raise ValueError("Nenhum produto carregado.")
+
+        margens = np.atleast_1d(np.asarray(margens, dtype=float))
+        custos_fixos_totais = np.atleast_1d(np.asarray(custos_fixos_totais, dtype=float))
+        if ((margens < 0) | (margens >= 1)).any():
+            raise ValueError("Margem de lucro deve ser um valor entre 0 e 0.99")
+
+        custo_compra = _custo_compra(self.produtos)
+        quantidade = self.produtos['Quantidade'].to_numpy(dtype=float)
+        total_itens_lote = quantidade.sum()
+        if volumes is None:
+            volumes = np.array([total_itens_lote])
+        volumes = np.atleast_1d(np.asarray(volumes, dtype=float))
+
+        # Custo fixo por unidade para cada (custo fixo, volume); volume zero não recebe rateio
+        volume_valido = volumes > 0
+        custo_fixo_unitario = np.where(
+            volume_valido,
+            (custos_fixos_totais[:, None] / 30) / np.where(volume_valido, volumes, 1),
+            0.0
+        )
+        divisor = 1 - margens
+
+        custo_total_lote = (custo_compra * quantidade).sum() + custo_fixo_unitario * total_itens_lote
+        receita_total = custo_total_lote[None, :, :] / divisor[:, None, None]
+        resultado = {
+            'margens': margens,
+            'custos_fixos_totais': custos_fixos_totais,
+            'volumes': volumes,
+            'receita_total': receita_total,
+            'lucro_total': receita_total - custo_total_lote[None, :, :],
         }
+        if not por_produto:
+            return resultado
 
-    def exportar_resultados(self, df_resultados: pd.DataFrame, arquivo_saida: str):
-        with pd.ExcelWriter(arquivo_saida, engine='xlsxwriter') as writer:
-            # Planilha principal - Análise de Produtos
-            df_resultados.to_excel(writer, sheet_name='Analise_Produtos', index=False, startrow=1)
-            
-            # Gerar relatório
-            relatorio = self.gerar_relatorio(df_resultados)
-            
-            # Planilha de resumo
-            df_resumo = pd.DataFrame([
-                ['Total de produtos diferentes', relatorio['total_produtos_diferentes']],
-                ['Total de itens comprados', f"{relatorio['total_itens_comprados']:,}"],
-                ['Custo total de compra', f"R$ {relatorio['custo_total_compra']:,.2f}"],
-                ['Custo fixo total', f"R$ {relatorio['custo_fixo_total']:,.2f}"],
-                ['Custo total geral', f"R$ {relatorio['custo_total_geral']:,.2f}"],
-                ['Receita total estimada', f"R$ {relatorio['receita_total_estimada']:,.2f}"],
-                ['Lucro total estimado', f"R$ {relatorio['lucro_total_estimado']:,.2f}"]
-            ], columns=['Métrica', 'Valor'])
-            df_resumo.to_excel(writer, sheet_name='Resumo_Financeiro', index=False)
-            
-            # Planilha de custos fixos
-            df_custos = pd.DataFrame(list(self.custos_fixos.items()), columns=['Custo', 'Valor Mensal'])
-            df_custos.to_excel(writer, sheet_name='Custos_Fixos', index=False)
-            
-            # Formatação profissional
-            workbook = writer.book
-            
-            # Cores e formatos
-            header_format = workbook.add_format({
+        n_produtos = len(custo_compra)
+        formato = (len(margens), len(custos_fixos_totais), len(volumes), n_produtos)
+        preco = np.empty(formato)
+        receita = np.empty(formato)
+        lucro = np.empty(formato)
+
+        # Cenários achatados: (margem, custo fixo unitário) de cada combinação
+        divisor_cenario = np.broadcast_to(divisor[:, None, None], formato[:3]).ravel()
+        fixo_cenario = np.broadcast_to(custo_fixo_unitario[None, :, :], formato[:3]).ravel()
+        preco_plano = preco.reshape(-1, n_produtos)
+        receita_plana = receita.reshape(-1, n_produtos)
+        lucro_plano = lucro.reshape(-1, n_produtos)
+
+        cenarios_por_bloco = max(1, max_elementos_bloco // max(n_produtos, 1))
+        for inicio in range(0, len(divisor_cenario), cenarios_por_bloco):
+            fim = inicio + cenarios_por_bloco
+            custo_total_unitario = custo_compra[None, :] + fixo_cenario[inicio:fim, None]
+            preco_bloco = custo_total_unitario / divisor_cenario[inicio:fim, None]
+            preco_plano[inicio:fim] = preco_bloco
+            receita_plana[inicio:fim] = preco_bloco * quantidade
+            lucro_plano[inicio:fim] = (preco_bloco - custo_total_unitario) * quantidade
+
+        resultado.update({'preco': preco, 'receita': receita, 'lucro': lucro})
+        return resultado
+
+    def _custos_metas(self, precos_maximos, configuracao: Optional[ConfiguracaoPreco]) -> Tuple:
+        # Custo total unitário (compra + fixo rateado), quantidade e teto de preço de cada produto.
+        # Tetos: dict por Nome_Produto, um valor por produto ou a coluna Preco_Maximo; vazio = sem teto.
+        with self._lock:
+            produtos = self.produtos
+            config = configuracao if configuracao is not None else self.configuracao()
+        if produtos.empty:
+            raise ValueError("Nenhum produto carregado.")
+
+        quantidade = produtos['Quantidade'].to_numpy(dtype=float)
+        custo = _custo_compra(produtos) + self._custo_fixo_por_produto(quantidade.sum(), config)
+        if precos_maximos is None and 'Preco_Maximo' in produtos.columns:
+            precos_maximos = converter_numeros_br(produtos['Preco_Maximo'])
+        if precos_maximos is None:
+            teto = np.full(len(custo), np.inf)
+        elif isinstance(precos_maximos, dict):
+            teto = produtos['Nome_Produto'].map(precos_maximos).to_numpy(dtype=float)
+        else:
+            teto = np.asarray(precos_maximos, dtype=float)
+            if teto.shape != custo.shape:
+                raise ValueError("precos_maximos deve ter um valor por produto")
+        return produtos['Nome_Produto'], custo, quantidade, np.where(np.isnan(teto), np.inf, teto), config
+
+    def margem_para_lucro(self, lucro_alvo: Numerico, precos_maximos: Union[Dict[str, float], Numerico] = None,
+                          configuracao: Optional[ConfiguracaoPreco] = None, tolerancia: float = 1e-9,
+                          max_elementos_bloco: int = 1_000_000) -> Numerico:
+        # Inverso de calcular_preco_lote: menor margem com que o lucro do lote atinge lucro_alvo
+        # (uma meta ou várias de uma vez). Sem tetos de preço, em forma fechada:
+        # lucro = custo do lote × m / (1 - m), logo m = lucro / (custo + lucro). Com tetos o
+        # lucro deixa de ter essa forma, e a margem sai de uma bissecção vetorizada (todas as
+        # metas e todos os produtos a cada passo). Meta que nem MARGEM_MAXIMA atinge dá NaN.
+        _, custo, quantidade, teto, _ = self._custos_metas(precos_maximos, configuracao)
+        alvo = np.asarray(lucro_alvo, dtype=float)
+        metas = alvo.ravel()
+
+        if np.isinf(teto).all():
+            margem = np.divide(metas, custo @ quantidade + metas, out=np.zeros_like(metas), where=metas > 0)
+        else:
+            margem = np.empty_like(metas)
+            iteracoes = int(np.ceil(np.log2(MARGEM_MAXIMA / tolerancia)))
+            metas_por_bloco = max(1, max_elementos_bloco // max(len(custo), 1))
+            for inicio in range(0, len(metas), metas_por_bloco):
+                bloco = metas[inicio:inicio + metas_por_bloco]
+                baixo = np.zeros_like(bloco)
+                alto = np.full_like(bloco, MARGEM_MAXIMA)
+                for _ in range(iteracoes):
+                    meio = (baixo + alto) / 2
+                    atinge = _lucro_com_tetos(meio, custo, quantidade, teto) >= bloco
+                    alto = np.where(atinge, meio, alto)
+                    baixo = np.where(atinge, baixo, meio)
+                margem[inicio:inicio + metas_por_bloco] = alto
+
+        # Metas já cobertas com margem zero não pedem margem; as acima do lucro máximo são inatingíveis
+        lucro_zero, lucro_maximo = _lucro_com_tetos(np.array([0.0, MARGEM_MAXIMA]), custo, quantidade, teto)
+        margem = np.where(metas <= lucro_zero, 0.0, margem)
+        margem = np.where(metas > lucro_maximo, np.nan, margem)
+        return float(margem[0]) if alvo.ndim == 0 else margem.reshape(alvo.shape)
+
+    def precos_equilibrio(self, precos_maximos: Union[Dict[str, float], Numerico] = None, margem: float = None,
+                          configuracao: Optional[ConfiguracaoPreco] = None) -> pd.DataFrame:
+        # Por produto, em forma fechada: preço de equilíbrio (lucro zero = custo total unitário),
+        # teto, maior margem que o teto permite e o preço na margem pedida (por padrão, a da
+        # configuração) limitado pelo teto. Produtos com teto abaixo do equilíbrio não são viáveis.
+        nomes, custo, quantidade, teto, config = self._custos_metas(precos_maximos, configuracao)
+        if margem is None:
+            margem = config.margem_lucro
+        if not 0 <= margem < 1:
+            raise ValueError("Margem de lucro deve ser um valor entre 0 e 0.99")
+
+        com_teto = np.isfinite(teto)
+        preco = np.minimum(custo / (1 - margem), teto)
+        lucro = preco - custo
+        return pd.DataFrame({
+            'Nome_Produto': nomes.to_numpy(),
+            'Quantidade': quantidade,
+            'preco_equilibrio': custo,
+            'preco_maximo': np.where(com_teto, teto, np.nan),
+            'margem_maxima': np.divide(teto - custo, teto, out=np.full_like(custo, np.nan), where=com_teto & (teto > 0)),
+            'viavel': teto >= custo,
+            'preco_venda_unitario': preco,
+            'lucro_unitario': lucro,
+            'margem_efetiva': np.divide(lucro, preco, out=np.zeros_like(lucro), where=preco > 0),
+        }, index=nomes.index)
+
+    def simular_monte_carlo(self, venda_padrao: Tuple[float, float, float] = (0.5, 0.8, 1.0),
+                            distribuicoes: Dict[str, Tuple[float, float, float]] = None, agrupar_por: str = None,
+                            n_simulacoes: int = 100_000, semente: int = 0, df_resultados: pd.DataFrame = None,
+                            max_elementos_bloco: int = 1_000_000, usar_processos: bool = False,
+                            max_processos: int = None) -> Dict:
+        # Lucro do lote quando nem tudo vende. A fração vendida segue uma distribuição
+        # triangular (mínimo, mais provável, máximo, entre 0 e 1), por produto (chave
+        # Nome_Produto, sorteio independente por produto) ou por grupo (agrupar_por, ex.:
+        # 'Categoria', um sorteio por grupo compartilhado pelos seus produtos). Sem chave
+        # em distribuicoes, vale venda_padrao. Os custos do lote inteiro (compra e fixos)
+        # são pagos de qualquer forma; o estoque que sobra não tem valor residual.
+        if df_resultados is None:
+            df_resultados = self.calcular_preco_lote()
+        df_resultados = centavos_para_reais(df_resultados)
+
+        with self._medir('monte_carlo') as medida:
+            medida.update(linhas=len(df_resultados), simulacoes=n_simulacoes)
+            receita_produtos = df_resultados['preco_venda_total'].to_numpy(dtype=float)
+            custo_lote = float(df_resultados['custo_total_geral'].sum())
+            if agrupar_por is None:
+                chaves = df_resultados['Nome_Produto'].astype(str).to_numpy()
+                receita_grupos = receita_produtos
+            else:
+                codigos, chaves = pd.factorize(df_resultados[agrupar_por].astype(str))
+                receita_grupos = np.bincount(codigos, weights=receita_produtos, minlength=len(chaves))
+
+            parametros = pd.DataFrame.from_dict(distribuicoes or {}, orient='index',
+                                                columns=['minimo', 'provavel', 'maximo'])
+            parametros = parametros.reindex(chaves).astype(float)
+            for coluna, valor in zip(parametros.columns, venda_padrao):
+                parametros[coluna] = parametros[coluna].fillna(valor)
+            minimo, provavel, maximo = (parametros[col].to_numpy() for col in parametros.columns)
+            if not ((0 <= minimo) & (minimo <= provavel) & (provavel <= maximo) & (maximo <= 1)).all():
+                raise ValueError("Frações de venda devem seguir 0 <= mínimo <= provável <= máximo <= 1")
+
+            # Tarefas de tamanho fixo, com sementes derivadas da mesma raiz: o resultado
+            # não depende de quantos processos (nem de quantos núcleos) foram usados
+            tamanhos = [min(SIMULACOES_POR_TAREFA, n_simulacoes - inicio)
+                        for inicio in range(0, n_simulacoes, SIMULACOES_POR_TAREFA)]
+            sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+            argumentos = [(receita_grupos, minimo, provavel, maximo, tamanho, semente_bloco, max_elementos_bloco)
+                          for tamanho, semente_bloco in zip(tamanhos, sementes)]
+            if usar_processos and len(argumentos) > 1:
+                with ProcessPoolExecutor(max_workers=max_processos) as executor:
+                    partes = list(executor.map(_simular_receitas, *zip(*argumentos)))
+            else:
+                partes = [_simular_receitas(*args) for args in argumentos]
+
+            lucros = np.concatenate(partes) - custo_lote
+            p5, p25, p50, p75, p95 = np.percentile(lucros, [5, 25, 50, 75, 95])
+            return {
+                'n_simulacoes': n_simulacoes,
+                'lucro_sem_sobras': float(receita_produtos.sum() - custo_lote),
+                'lucro_medio': float(lucros.mean()),
+                'lucro_desvio_padrao': float(lucros.std()),
+                'percentis': {5: p5, 25: p25, 50: p50, 75: p75, 95: p95},
+                'probabilidade_prejuizo': float((lucros < 0).mean()),
+                'lucros': lucros,
+            }
+
+    def _resumo_monte_carlo(self, simulacao: Dict) -> pd.DataFrame:
+        linhas = [
+            ['Simulações', simulacao['n_simulacoes']],
+            ['Lucro se todo o lote vender (R$)', simulacao['lucro_sem_sobras']],
+            ['Lucro médio (R$)', simulacao['lucro_medio']],
+            ['Desvio padrão do lucro (R$)', simulacao['lucro_desvio_padrao']],
+        ]
+        linhas += [[f'Lucro P{p} (R$)', float(valor)] for p, valor in simulacao['percentis'].items()]
+        linhas.append(['Probabilidade de prejuízo (%)', simulacao['probabilidade_prejuizo'] * 100])
+        return pd.DataFrame(linhas, columns=['Métrica', 'Valor'])
+
+    def gerar_relatorio(self, df_resultados: pd.DataFrame, agrupar_por: List[str] = None) -> Dict:
+        # Todas as somas saem de uma única redução sobre o bloco de colunas; médias são
+        # derivadas dos totais, e as quebras (Categoria, Fornecedor) de um groupby só.
+        with self._medir('relatorio') as medida:
+            medida['linhas'] = len(df_resultados)
+            centavos = df_resultados.attrs.get('unidade_monetaria') == 'centavos'
+
+            somas = df_resultados[list(TOTAIS_RELATORIO)].sum()
+            relatorio = {'total_produtos_diferentes': len(df_resultados)}
+            for coluna, chave in TOTAIS_RELATORIO.items():
+                if coluna == 'Quantidade':
+                    # Soma à parte: int32 do modo compacto estouraria, e o float64 das
+                    # somas conjuntas perderia a exatidão de totais inteiros grandes
+                    quantidade = df_resultados['Quantidade']
+                    if pd.api.types.is_integer_dtype(quantidade):
+                        relatorio[chave] = int(quantidade.to_numpy(dtype=np.int64).sum())
+                    else:
+                        relatorio[chave] = float(quantidade.sum())
+                elif centavos:
+                    # Somas inteiras exatas; só o total final vira reais
+                    relatorio[chave] = int(somas[coluna]) / 100
+                else:
+                    relatorio[chave] = somas[coluna]
+            if 'preco_sem_arredondamento' in df_resultados.columns:
+                # Receita que o lote teria sem a escada de preços, para medir o efeito do arredondamento
+                tipo = np.int64 if centavos else float
+                receita = (df_resultados['preco_sem_arredondamento'].to_numpy(dtype=tipo)
+                           * df_resultados['Quantidade'].to_numpy(dtype=tipo)).sum()
+                relatorio['receita_sem_arredondamento'] = int(receita) / 100 if centavos else float(receita)
+            relatorio.update(self._medias_relatorio(relatorio))
+
+            if len(df_resultados) and 'Nome_Produto' in df_resultados.columns:
+                nomes = df_resultados['Nome_Produto'].to_numpy()
+                if 'preco_venda_unitario' in df_resultados.columns:
+                    precos = df_resultados['preco_venda_unitario'].to_numpy()
+                    relatorio['produto_mais_caro_unitario'] = nomes[precos.argmax()]
+                    relatorio['produto_mais_barato_unitario'] = nomes[precos.argmin()]
+                relatorio['produto_maior_quantidade'] = nomes[df_resultados['Quantidade'].to_numpy().argmax()]
+
+            if agrupar_por is None:
+                agrupar_por = [col for col in COLUNAS_AGRUPAMENTO if col in df_resultados.columns]
+            relatorio['agrupamentos'] = {
+                coluna: self._agrupar_relatorio(df_resultados, coluna, centavos) for coluna in agrupar_por
+            }
+            return relatorio
+
+    def _medias_relatorio(self, relatorio: Dict) -> Dict:
+        # Médias ponderadas pelo lote: markup sobre o custo total e margem sobre a receita.
+        # Com escada de preços, margem_lucro_media já é a efetiva (depois do arredondamento).
+        custo = relatorio['custo_total_geral']
+        receita = relatorio['receita_total_estimada']
+        lucro = relatorio['lucro_total_estimado']
+        medias = {
+            'markup_medio': lucro / custo * 100 if custo else 0.0,
+            'margem_lucro_media': lucro / receita * 100 if receita else 0.0,
+        }
+        if 'receita_sem_arredondamento' in relatorio:
+            receita_sem = relatorio['receita_sem_arredondamento']
+            medias['margem_lucro_sem_arredondamento'] = (receita_sem - custo) / receita_sem * 100 if receita_sem else 0.0
+            medias['receita_arredondamento'] = receita - receita_sem
+        return medias
+
+    def _agrupar_relatorio(self, df_resultados: pd.DataFrame, coluna: str, centavos: bool = False) -> pd.DataFrame:
+        agrupado = df_resultados.groupby(coluna, observed=True, sort=True).agg(
+            produtos=('Quantidade', 'size'),
+            itens=('Quantidade', 'sum'),
+            custo_total_compra=('custo_total_compra', 'sum'),
+            custo_total_geral=('custo_total_geral', 'sum'),
+            receita_total=('preco_venda_total', 'sum'),
+            lucro_total=('lucro_total', 'sum'),
+        )
+        if centavos:
+            colunas_dinheiro = ['custo_total_compra', 'custo_total_geral', 'receita_total', 'lucro_total']
+            agrupado[colunas_dinheiro] = agrupado[colunas_dinheiro] / 100
+        receita = agrupado['receita_total'].to_numpy(dtype=float)
+        lucro = agrupado['lucro_total'].to_numpy(dtype=float)
+        agrupado['margem_lucro'] = np.divide(lucro * 100, receita, out=np.zeros_like(lucro), where=receita != 0)
+        return agrupado.reset_index()
+
+    def _montar_resumo(self, relatorio: Dict) -> pd.DataFrame:
+        linhas = [
+            ['Total de produtos diferentes', relatorio['total_produtos_diferentes']],
+            ['Total de itens comprados', f"{relatorio['total_itens_comprados']:,}"],
+            ['Custo total de compra', f"R$ {relatorio['custo_total_compra']:,.2f}"],
+            ['Custo fixo total', f"R$ {relatorio['custo_fixo_total']:,.2f}"],
+            ['Custo total geral', f"R$ {relatorio['custo_total_geral']:,.2f}"],
+            ['Receita total estimada', f"R$ {relatorio['receita_total_estimada']:,.2f}"],
+            ['Lucro total estimado', f"R$ {relatorio['lucro_total_estimado']:,.2f}"],
+            ['Markup médio', f"{relatorio['markup_medio']:.1f}%"],
+            ['Margem de lucro média', f"{relatorio['margem_lucro_media']:.1f}%"]
+        ]
+        if 'receita_sem_arredondamento' in relatorio:
+            linhas += [
+                ['Margem antes do arredondamento', f"{relatorio['margem_lucro_sem_arredondamento']:.1f}%"],
+                ['Receita extra do arredondamento', f"R$ {relatorio['receita_arredondamento']:,.2f}"]
+            ]
+        return pd.DataFrame(linhas, columns=['Métrica', 'Valor'])
+
+    def _criar_formatos(self, workbook) -> Dict:
+        # Cores e formatos
+        return {
+            'header': workbook.add_format({
                 'bold': True,
                 'text_wrap': True,
                 'valign': 'top',
@@ -128,70 +1417,209 @@ class AnaliseFinanceira:
                 'font_color': 'white',
                 'border': 1,
                 'align': 'center'
-            })
-            
-            title_format = workbook.add_format({
+            }),
+            'title': workbook.add_format({
                 'bold': True,
                 'font_size': 14,
                 'fg_color': '#4F81BD',
                 'font_color': 'white',
                 'border': 1,
                 'align': 'center'
-            })
-            
-            money_format = workbook.add_format({
+            }),
+            'money': workbook.add_format({
                 'num_format': 'R$ #,##0.00',
                 'border': 1,
                 'align': 'right'
-            })
-            
-            percent_format = workbook.add_format({
+            }),
+            'percent': workbook.add_format({
                 'num_format': '0.0%',
                 'border': 1,
                 'align': 'right'
-            })
-            
-            data_format = workbook.add_format({
+            }),
+            'data': workbook.add_format({
                 'border': 1,
                 'align': 'left'
-            })
-            
-            total_format = workbook.add_format({
+            }),
+            'total': workbook.add_format({
                 'bold': True,
                 'fg_color': '#D9E2F3',
                 'border': 1,
                 'align': 'right'
-            })
-            
-            # Formatar planilha Analise_Produtos
-            worksheet_produtos = writer.sheets['Analise_Produtos']
+            }),
+        }
+
+    def _formato_coluna(self, col_name: str, formatos: Dict) -> Tuple:
+        # Retorna (formato, escala) para a coluna; porcentagens vêm em 0-100 e vão para 0-1
+        nome = col_name.lower()
+        if 'custo' in nome or 'preco' in nome or 'lucro' in nome:
+            return formatos['money'], 1
+        elif 'markup' in nome or 'margem' in nome:
+            return formatos['percent'], 100
+        return formatos['data'], 1
+
+    def _adicionar_graficos(self, workbook, worksheet_resumo):
+        # Adicionar gráficos na planilha de resumo
+        # Gráfico de Pizza para Custos Fixos
+        chart_pie = workbook.add_chart({'type': 'pie'})
+        chart_pie.add_series({
+            'name':       'Composição dos Custos Fixos',
+            'categories': '=Custos_Fixos!$A$4:$A$9', # Ajustado para os dados reais
+            'values':     '=Custos_Fixos!$B$4:$B$9', # Ajustado para os dados reais
+        })
+        chart_pie.set_title({'name': 'Composição dos Custos Fixos Mensais'})
+        worksheet_resumo.insert_chart('D2', chart_pie, {'x_offset': 25, 'y_offset': 10})
+
+        # Gráfico de Colunas para Receita vs Custo vs Lucro
+        chart_column = workbook.add_chart({'type': 'column'})
+        chart_column.add_series({
+            'name':       'Receita Estimada',
+            'categories': '=Resumo_Financeiro!$A$4',
+            'values':     '=Resumo_Financeiro!$B$4',
+        })
+        chart_column.add_series({
+            'name':       'Custo Total Geral',
+            'categories': '=Resumo_Financeiro!$A$6',
+            'values':     '=Resumo_Financeiro!$B$6',
+        })
+        chart_column.add_series({
+            'name':       'Lucro Estimado',
+            'categories': '=Resumo_Financeiro!$A$7',
+            'values':     '=Resumo_Financeiro!$B$7',
+        })
+        chart_column.set_title({'name': 'Receita, Custo e Lucro Estimados'})
+        chart_column.set_y_axis({'name': 'Valor (R$)'})
+        worksheet_resumo.insert_chart('D18', chart_column, {'x_offset': 25, 'y_offset': 10})
+
+    def exportar_resultados(self, df_resultados: pd.DataFrame, arquivo_saida: Union[str, BinaryIO, None] = None,
+                            streaming: bool = False, agrupamentos: bool = False, formato: str = None,
+                            compressao: str = None, monte_carlo: Dict = None) -> Optional[bytes]:
+        # Aceita um caminho ou qualquer destino binário (ex.: BytesIO). Sem destino,
+        # gera o relatório em memória. Para destinos em memória, devolve os bytes.
+        # Com agrupamentos, as quebras do relatório (ex.: Categoria) viram planilhas extras;
+        # com monte_carlo (resultado de simular_monte_carlo), o resumo da simulação também.
+        # O formato vem da extensão do caminho ou do parâmetro formato (padrão: xlsx).
+        destino = io.BytesIO() if arquivo_saida is None else arquivo_saida
+        formato = self._formato_exportacao(destino, formato)
+        df_resultados = centavos_para_reais(df_resultados)
+        with self._medir('exportar') as medida:
+            medida.update(linhas=len(df_resultados), formato=formato)
+            if formato != 'xlsx':
+                self._exportar_colunar(df_resultados, destino, formato, compressao, agrupamentos, monte_carlo)
+            elif streaming:
+                self._exportar_resultados_streaming(df_resultados, destino, agrupamentos=agrupamentos,
+                                                    monte_carlo=monte_carlo)
+            else:
+                self._exportar_excel(df_resultados, destino, agrupamentos=agrupamentos, monte_carlo=monte_carlo)
+
+        if isinstance(destino, (str, os.PathLike)):
+            print(f"Resultados exportados para: {destino}")
+            return None
+        return destino.getvalue() if hasattr(destino, 'getvalue') else None
+
+    def _formato_exportacao(self, arquivo_saida: Union[str, BinaryIO], formato: str = None) -> str:
+        if formato is not None:
+            if formato not in EXTENSOES_EXPORTACAO.values():
+                raise ValueError(f"Formato de exportação não suportado: {formato}")
+            return formato
+        if not isinstance(arquivo_saida, (str, os.PathLike)):
+            return 'xlsx'
+        return EXTENSOES_EXPORTACAO.get(self._separar_extensao(arquivo_saida)[1].lower(), 'xlsx')
+
+    def _separar_extensao(self, caminho: Union[str, os.PathLike]) -> Tuple[str, str, str]:
+        # 'saida/relatorio.csv.gz' -> ('saida/relatorio', '.csv', '.gz')
+        base, extensao = os.path.splitext(str(caminho))
+        if extensao.lower() in EXTENSOES_COMPRESSAO:
+            base, interna = os.path.splitext(base)
+            return base, interna, extensao
+        return base, extensao, ''
+
+    def _exportar_colunar(self, df_resultados: pd.DataFrame, arquivo_saida: Union[str, BinaryIO], formato: str,
+                          compressao: str = None, agrupamentos: bool = False, monte_carlo: Dict = None):
+        # Produtos vão para o arquivo pedido; resumo, custos fixos e quebras, para arquivos
+        # ao lado com sufixo (relatorio_resumo.parquet...). Um destino em memória recebe só os produtos.
+        if not isinstance(arquivo_saida, (str, os.PathLike)):
+            self._gravar_tabela(df_resultados, arquivo_saida, formato, compressao)
+            return
+
+        relatorio = self.gerar_relatorio(df_resultados, agrupar_por=None if agrupamentos else [])
+        quebras = relatorio.pop('agrupamentos')
+        tabelas = {
+            '': df_resultados,
+            '_resumo': pd.DataFrame([relatorio]),
+            '_custos_fixos': pd.DataFrame(list(self.custos_fixos.items()), columns=['Custo', 'Valor Mensal']),
+        }
+        for coluna, df_grupo in quebras.items():
+            tabelas[f'_por_{coluna.lower()}'] = df_grupo
+        if monte_carlo is not None:
+            tabelas['_monte_carlo'] = self._resumo_monte_carlo(monte_carlo)
+
+        base, extensao, sufixo_compressao = self._separar_extensao(arquivo_saida)
+        if formato == 'csv' and compressao is None:
+            compressao = EXTENSOES_COMPRESSAO.get(sufixo_compressao.lower())
+        for sufixo, tabela in tabelas.items():
+            self._gravar_tabela(tabela, f"{base}{sufixo}{extensao}{sufixo_compressao}", formato, compressao)
+
+    def _gravar_tabela(self, tabela: pd.DataFrame, destino: Union[str, BinaryIO], formato: str,
+                       compressao: str = None):
+        if formato == 'csv':
+            self._gravar_csv(tabela, destino, compressao)
+        elif formato == 'parquet':
+            tabela.to_parquet(destino, index=False, compression=compressao or 'snappy')
+        else:
+            # Feather exige o índice padrão
+            tabela.reset_index(drop=True).to_feather(destino, compression=compressao)
+
+    def _gravar_csv(self, tabela: pd.DataFrame, destino: Union[str, BinaryIO], compressao: str = None):
+        # Escritor CSV do Arrow: multithread e várias vezes mais rápido que to_csv
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pa_csv
+        except ImportError:
+            raise ImportError("A exportação em CSV precisa do pacote 'pyarrow' (pip install pyarrow)")
+        tabela_arrow = pa.Table.from_pandas(tabela, preserve_index=False)
+
+        if isinstance(destino, (str, os.PathLike)):
+            if compressao:
+                with pa.CompressedOutputStream(str(destino), compressao) as saida:
+                    pa_csv.write_csv(tabela_arrow, saida)
+            else:
+                pa_csv.write_csv(tabela_arrow, str(destino))
+            return
+
+        # Destino do chamador (ex.: BytesIO): monta no buffer do Arrow para não fechá-lo
+        buffer = pa.BufferOutputStream()
+        if compressao:
+            with pa.CompressedOutputStream(buffer, compressao) as saida:
+                pa_csv.write_csv(tabela_arrow, saida)
+        else:
+            pa_csv.write_csv(tabela_arrow, buffer)
+        destino.write(buffer.getvalue().to_pybytes())
+
+    def _exportar_excel(self, df_resultados: pd.DataFrame, arquivo_saida: Union[str, BinaryIO],
+                        agrupamentos: bool = False, monte_carlo: Dict = None):
+        with pd.ExcelWriter(arquivo_saida, engine='xlsxwriter') as writer:
+            workbook = writer.book
+            formatos = self._criar_formatos(workbook)
+            header_format = formatos['header']
+            title_format = formatos['title']
+            data_format = formatos['data']
+            total_format = formatos['total']
+
+            # Planilha principal - Análise de Produtos: cada célula é escrita uma vez só,
+            # já formatada, pelo mesmo caminho do modo streaming
+            worksheet_produtos, colunas = self._iniciar_produtos_streaming(workbook, formatos, df_resultados.columns)
+            self._escrever_bloco_produtos(worksheet_produtos, df_resultados, colunas, 2)
             
-            # Título
-            worksheet_produtos.merge_range('A1:N1', 'ANÁLISE FINANCEIRA DE PRODUTOS', title_format)
+            # Gerar relatório
+            relatorio = self.gerar_relatorio(df_resultados)
             
-            # Observação: o pandas já escreveu o cabeçalho (devido a to_excel with startrow=1)
-            # Portanto NÃO escrevemos os cabeçalhos manualmente para evitar duplicação.
-            # Precisamos ajustar a posição onde escrevemos os dados formatados.
-            # Os dados reais começam em startrow + 1 (ou seja, linha 2 -> índice 2 no Excel é 1-based).
-            data_start_row = 2  # 0-based index para xlsxwriter: linha onde começam os dados (após título e cabeçalho)
-
-            # Dados (aplicando formatação por coluna)
-            for row_num in range(len(df_resultados)):
-                for col_num, col_name in enumerate(df_resultados.columns):
-                    value = df_resultados.iloc[row_num][col_name]
-                    excel_row = data_start_row + row_num
-                    if 'custo' in col_name.lower() or 'preco' in col_name.lower() or 'lucro' in col_name.lower():
-                        worksheet_produtos.write(excel_row, col_num, value, money_format)
-                    elif 'markup' in col_name.lower() or 'margem' in col_name.lower():
-                        # marcar porcentagens: os valores em df_resultados estão em porcentagem (ex: 25.0)
-                        worksheet_produtos.write(excel_row, col_num, value / 100, percent_format)
-                    else:
-                        worksheet_produtos.write(excel_row, col_num, value, data_format)
+            # Planilha de resumo
+            df_resumo = self._montar_resumo(relatorio)
+            df_resumo.to_excel(writer, sheet_name='Resumo_Financeiro', index=False)
             
-            # Ajustar largura das colunas
-            col_widths = [25, 12, 10, 15, 15, 15, 15, 15, 15, 12, 15, 15, 15, 15] # Ajustar conforme as colunas reais
-            for i, width in enumerate(col_widths):
-                worksheet_produtos.set_column(i, i, width)
+            # Planilha de custos fixos
+            df_custos = pd.DataFrame(list(self.custos_fixos.items()), columns=['Custo', 'Valor Mensal'])
+            df_custos.to_excel(writer, sheet_name='Custos_Fixos', index=False)
             
             # Formatar planilha Resumo_Financeiro
             worksheet_resumo = writer.sheets['Resumo_Financeiro']
@@ -242,46 +1670,251 @@ class AnaliseFinanceira:
             worksheet_custos.set_column('A:A', 25)
             worksheet_custos.set_column('B:B', 20)
 
-            # Adicionar gráficos na planilha de resumo
-            # Gráfico de Pizza para Custos Fixos
-            chart_pie = workbook.add_chart({'type': 'pie'})
-            chart_pie.add_series({
-                'name':       'Composição dos Custos Fixos',
-                'categories': '=Custos_Fixos!$A$4:$A$9', # Ajustado para os dados reais
-                'values':     '=Custos_Fixos!$B$4:$B$9', # Ajustado para os dados reais
-            })
-            chart_pie.set_title({'name': 'Composição dos Custos Fixos Mensais'})
-            worksheet_resumo.insert_chart('D2', chart_pie, {'x_offset': 25, 'y_offset': 10})
-
-            # Gráfico de Colunas para Receita vs Custo vs Lucro
-            chart_column = workbook.add_chart({'type': 'column'})
-            chart_column.add_series({
-                'name':       'Receita Estimada',
-                'categories': '=Resumo_Financeiro!$A$4',
-                'values':     '=Resumo_Financeiro!$B$4',
-            })
-            chart_column.add_series({
-                'name':       'Custo Total Geral',
-                'categories': '=Resumo_Financeiro!$A$6',
-                'values':     '=Resumo_Financeiro!$B$6',
-            })
-            chart_column.add_series({
-                'name':       'Lucro Estimado',
-                'categories': '=Resumo_Financeiro!$A$7',
-                'values':     '=Resumo_Financeiro!$B$7',
-            })
-            chart_column.set_title({'name': 'Receita, Custo e Lucro Estimados'})
-            chart_column.set_y_axis({'name': 'Valor (R$)'})
-            worksheet_resumo.insert_chart('D18', chart_column, {'x_offset': 25, 'y_offset': 10})
+            self._adicionar_graficos(workbook, worksheet_resumo)
+
+            if agrupamentos:
+                self._escrever_agrupamentos(workbook, formatos, relatorio)
+            if monte_carlo is not None:
+                self._escrever_monte_carlo(workbook, formatos, monte_carlo)
+
+    def _iniciar_produtos_streaming(self, workbook, formatos: Dict, nomes_colunas: List[str]) -> Tuple:
+        worksheet_produtos = workbook.add_worksheet('Analise_Produtos')
+        col_widths = [25, 12, 10, 15, 15, 15, 15, 15, 15, 12, 15, 15, 15, 15]
+        for i, width in enumerate(col_widths):
+            worksheet_produtos.set_column(i, i, width)
+
+        worksheet_produtos.merge_range('A1:N1', 'ANÁLISE FINANCEIRA DE PRODUTOS', formatos['title'])
+        worksheet_produtos.write_row(1, 0, list(nomes_colunas), formatos['header'])
+
+        # Formato e escala resolvidos uma vez por coluna, não por célula
+        colunas = [self._formato_coluna(col_name, formatos) for col_name in nomes_colunas]
+        return worksheet_produtos, colunas
+
+    def _escrever_bloco_produtos(self, worksheet_produtos, bloco: pd.DataFrame, colunas: List[Tuple],
+                                 linha_inicial: int):
+        valores = []
+        for col_name, (_, escala) in zip(bloco.columns, colunas):
+            serie = bloco[col_name]
+            if escala != 1:
+                serie = serie / escala
+            # NaN vira célula vazia, como faz o to_excel
+            valores.append(serie.astype(object).where(serie.notna(), None).tolist())
+
+        for offset, linha in enumerate(zip(*valores)):
+            for col_num, value in enumerate(linha):
+                worksheet_produtos.write(linha_inicial + offset, col_num, value, colunas[col_num][0])
+
+    def _escrever_resumo_streaming(self, workbook, formatos: Dict, relatorio: Dict):
+        df_resumo = self._montar_resumo(relatorio)
+        df_custos = pd.DataFrame(list(self.custos_fixos.items()), columns=['Custo', 'Valor Mensal'])
+
+        # Planilha de resumo
+        worksheet_resumo = workbook.add_worksheet('Resumo_Financeiro')
+        worksheet_resumo.set_column('A:A', 35)
+        worksheet_resumo.set_column('B:B', 25)
+        worksheet_resumo.merge_range('A1:B1', 'RESUMO FINANCEIRO', formatos['title'])
+        worksheet_resumo.write_row(2, 0, ['Métrica', 'Valor'], formatos['header'])
+        for row_num, (metrica, valor) in enumerate(df_resumo.itertuples(index=False, name=None)):
+            worksheet_resumo.write_row(row_num + 3, 0, [metrica, valor], formatos['data'])
+
+        # Planilha de custos fixos
+        worksheet_custos = workbook.add_worksheet('Custos_Fixos')
+        worksheet_custos.set_column('A:A', 25)
+        worksheet_custos.set_column('B:B', 20)
+        worksheet_custos.merge_range('A1:B1', 'CUSTOS FIXOS MENSAIS', formatos['title'])
+        worksheet_custos.write_row(2, 0, ['Custo', 'Valor Mensal'], formatos['header'])
+        for row_num, (custo, valor) in enumerate(df_custos.itertuples(index=False, name=None)):
+            cell_format = formatos['total'] if 'TOTAL' in str(custo) else formatos['data']
+            worksheet_custos.write_row(row_num + 3, 0, [custo, valor], cell_format)
+
+        self._adicionar_graficos(workbook, worksheet_resumo)
+
+    def _escrever_agrupamentos(self, workbook, formatos: Dict, relatorio: Dict):
+        # Uma planilha por quebra, escrita de cima para baixo (compatível com memória constante)
+        for coluna, df_grupo in relatorio.get('agrupamentos', {}).items():
+            worksheet = workbook.add_worksheet(f"Por_{coluna}"[:31])
+            worksheet.set_column(0, 0, 25)
+            worksheet.set_column(1, len(df_grupo.columns) - 1, 15)
+            worksheet.merge_range(0, 0, 0, len(df_grupo.columns) - 1, f'RESUMO POR {coluna.upper()}', formatos['title'])
+            worksheet.write_row(2, 0, list(df_grupo.columns), formatos['header'])
+
+            colunas = []
+            for col_name in df_grupo.columns:
+                if col_name in ('produtos', 'itens') or col_name == coluna:
+                    colunas.append((formatos['data'], 1))
+                else:
+                    colunas.append(self._formato_coluna(col_name, formatos))
+            self._escrever_bloco_produtos(worksheet, df_grupo, colunas, 3)
+
+    def _escrever_monte_carlo(self, workbook, formatos: Dict, simulacao: Dict):
+        # Resumo da simulação, escrito de cima para baixo (compatível com memória constante)
+        worksheet = workbook.add_worksheet('Simulacao_Monte_Carlo')
+        worksheet.set_column('A:A', 35)
+        worksheet.set_column('B:B', 20)
+        worksheet.merge_range('A1:B1', 'SIMULAÇÃO DE VENDAS (MONTE CARLO)', formatos['title'])
+        worksheet.write_row(2, 0, ['Métrica', 'Valor'], formatos['header'])
+        for row_num, (metrica, valor) in enumerate(self._resumo_monte_carlo(simulacao).itertuples(index=False, name=None)):
+            worksheet.write(row_num + 3, 0, metrica, formatos['data'])
+            worksheet.write(row_num + 3, 1, valor, formatos['money'] if '(R$)' in metrica else formatos['data'])
+
+    def _abrir_writer_streaming(self, arquivo_saida: Union[str, BinaryIO]) -> pd.ExcelWriter:
+        # Modo de memória constante do xlsxwriter: cada linha é gravada uma única vez,
+        # em ordem, e descarregada no disco assim que a próxima começa.
+        # Por isso todas as planilhas são escritas de cima para baixo, sem to_excel.
+        return pd.ExcelWriter(arquivo_saida, engine='xlsxwriter',
+                              engine_kwargs={'options': {'constant_memory': True}})
+
+    def _exportar_resultados_streaming(self, df_resultados: pd.DataFrame, arquivo_saida: Union[str, BinaryIO],
+                                       tamanho_bloco: int = 10000, agrupamentos: bool = False,
+                                       monte_carlo: Dict = None):
+        relatorio = self.gerar_relatorio(df_resultados)
+
+        with self._abrir_writer_streaming(arquivo_saida) as writer:
+            workbook = writer.book
+            formatos = self._criar_formatos(workbook)
+
+            # Planilha principal - Análise de Produtos
+            worksheet_produtos, colunas = self._iniciar_produtos_streaming(workbook, formatos, df_resultados.columns)
+            data_start_row = 2
+            for inicio in range(0, len(df_resultados), tamanho_bloco):
+                bloco = df_resultados.iloc[inicio:inicio + tamanho_bloco]
+                self._escrever_bloco_produtos(worksheet_produtos, bloco, colunas, data_start_row + inicio)
+
+            self._escrever_resumo_streaming(workbook, formatos, relatorio)
+            if agrupamentos:
+                self._escrever_agrupamentos(workbook, formatos, relatorio)
+            if monte_carlo is not None:
+                self._escrever_monte_carlo(workbook, formatos, monte_carlo)
+
+    def _ler_blocos(self, arquivo: str, tamanho_bloco: int, colunas: List[str] = None) -> Iterator[pd.DataFrame]:
+        # Lê a planilha em blocos de linhas: CSV com chunksize do pandas,
+        # xlsx com a iteração somente-leitura do openpyxl (sem carregar o arquivo inteiro).
+        # Colunas pedidas que não existem no arquivo são ignoradas.
+        extensao = os.path.splitext(str(arquivo))[1].lower()
+
+        if extensao == '.csv':
+            cabecalho = pd.read_csv(arquivo, nrows=0).columns
+            _verificar_colunas(cabecalho)
+            usecols = [col for col in colunas if col in cabecalho] if colunas else None
+            yield from pd.read_csv(arquivo, chunksize=tamanho_bloco, usecols=usecols)
+            return
+
+        if extensao not in ('.xlsx', '.xlsm'):
+            raise ValueError(f"Formato não suportado no modo streaming: {extensao or arquivo}")
+
+        workbook = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            linhas = workbook.worksheets[0].iter_rows(values_only=True)
+            cabecalho = list(next(linhas, ()))
+            _verificar_colunas(cabecalho)
+
+            if colunas:
+                nomes = [col for col in colunas if col in cabecalho]
+            else:
+                nomes = [col for col in cabecalho if col is not None]
+            indices = [cabecalho.index(col) for col in nomes]
+            buffer = []
+            for linha in linhas:
+                buffer.append([linha[i] if i < len(linha) else None for i in indices])
+                if len(buffer) == tamanho_bloco:
+                    yield pd.DataFrame(buffer, columns=nomes)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=nomes)
+        finally:
+            workbook.close()
+
+    def precificar_arquivo_streaming(self, arquivo_entrada: str, arquivo_saida: str,
+                                     tamanho_bloco: int = 10000, escada: Tuple = None) -> Dict:
+        # 1ª passada (barata): só soma as quantidades válidas, pois o rateio do
+        # custo fixo depende do total de itens do lote.
+        total_itens_lote = 0
+        total_linhas = 0
+        colunas_custo = ['Custo_Compra', 'Quantidade', *COLUNAS_PACOTE]
+        for bloco in self._ler_blocos(arquivo_entrada, tamanho_bloco, colunas=colunas_custo):
+            custo, quantidade, _ = self._custo_e_quantidade(bloco)
+            quantidade = quantidade.fillna(1)
+            total_itens_lote += quantidade[custo.notna()].sum()
+            total_linhas += int(custo.notna().sum())
+
+        if total_linhas == 0:
+            raise ValueError("Nenhum produto carregado.")
+
+        custo_fixo_por_produto = self._custo_fixo_por_produto(total_itens_lote)
+
+        # 2ª passada: valida, precifica e grava cada bloco direto na saída
+        relatorio = None
+        saida_csv = os.path.splitext(str(arquivo_saida))[1].lower() == '.csv'
+
+        with contextlib.ExitStack() as stack:
+            if saida_csv:
+                arquivo_csv = stack.enter_context(open(arquivo_saida, 'w', newline='', encoding='utf-8'))
+            else:
+                writer = stack.enter_context(self._abrir_writer_streaming(arquivo_saida))
+                workbook = writer.book
+                formatos = self._criar_formatos(workbook)
+                worksheet_produtos = None
+
+            linha_atual = 2
+            for bloco in self._ler_blocos(arquivo_entrada, tamanho_bloco):
+                bloco = self._validar_produtos(bloco)
+                if bloco.empty:
+                    continue
+                df_bloco = self._precificar(bloco, custo_fixo_por_produto)
+                if escada is not None:
+                    df_bloco = self.aplicar_escada_precos(df_bloco, escada)
+
+                if saida_csv:
+                    df_bloco.to_csv(arquivo_csv, header=relatorio is None, index=False)
+                else:
+                    if worksheet_produtos is None:
+                        worksheet_produtos, colunas = self._iniciar_produtos_streaming(
+                            workbook, formatos, df_bloco.columns)
+                    self._escrever_bloco_produtos(worksheet_produtos, df_bloco, colunas, linha_atual)
+                    linha_atual += len(df_bloco)
+
+                # Os totais do relatório são somas, então podem ser acumulados bloco a bloco
+                relatorio_bloco = self.gerar_relatorio(df_bloco, agrupar_por=[])
+                chaves_somadas = ['total_produtos_diferentes', *TOTAIS_RELATORIO.values()]
+                if escada is not None:
+                    chaves_somadas.append('receita_sem_arredondamento')
+                if relatorio is None:
+                    relatorio = {chave: relatorio_bloco[chave] for chave in chaves_somadas}
+                else:
+                    relatorio = {chave: relatorio[chave] + relatorio_bloco[chave] for chave in chaves_somadas}
+
+            relatorio.update(self._medias_relatorio(relatorio))
+            if not saida_csv:
+                self._escrever_resumo_streaming(workbook, formatos, relatorio)
 
         print(f"Resultados exportados para: {arquivo_saida}")
+        return relatorio
 
-    def criar_template_excel(self, arquivo_template: str):
-        dados_template = {
-            'Nome_Produto': ['Leite Longa Vida 1L', 'Macarrão Instantâneo', 'Arroz 5kg'],
-            'Custo_Compra': [4.50, 1.50, 15.50],
-            'Quantidade': [50, 100, 20]
-        }
-        df_template = pd.DataFrame(dados_template)
+    def gerar_catalogo_sintetico(self, n_produtos: int, semente: int = 0) -> pd.DataFrame:
+        # Catálogo fictício e determinístico (mesma semente, mesmos dados), no formato
+        # do template, para testes de desempenho com qualquer número de produtos
+        nomes_base = np.array([
+            'Leite Longa Vida 1L', 'Macarrão Instantâneo', 'Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja',
+            'Café 500g', 'Açúcar 1kg', 'Farinha de Trigo 1kg', 'Pão de Forma', 'Queijo Mussarela 500g'
+        ], dtype=object)
+        rng = np.random.default_rng(semente)
+        indices = np.arange(n_produtos)
+        sufixos = pd.Series(indices).astype(str).str.zfill(7).to_numpy(dtype=object)
+        return pd.DataFrame({
+            'Nome_Produto': nomes_base[indices % len(nomes_base)] + ' #' + sufixos,
+            'Custo_Compra': np.round(rng.uniform(0.5, 80.0, n_produtos), 2),
+            'Quantidade': rng.integers(1, 201, n_produtos),
+        })
+
+    def criar_template_excel(self, arquivo_template: str, n_produtos: int = None, semente: int = 0):
+        if n_produtos is None:
+            dados_template = {
+                'Nome_Produto': ['Leite Longa Vida 1L', 'Macarrão Instantâneo', 'Arroz 5kg'],
+                'Custo_Compra': [4.50, 1.50, 15.50],
+                'Quantidade': [50, 100, 20]
+            }
+            df_template = pd.DataFrame(dados_template)
+        else:
+            df_template = self.gerar_catalogo_sintetico(n_produtos, semente)
         df_template.to_excel(arquivo_template, index=False, sheet_name='Produtos')
         print(f"Template criado: {arquivo_template}")
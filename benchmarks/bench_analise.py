@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks das etapas principais (carregar, precificar, relatório, exportar)
+
+Uso:
+    python benchmarks/bench_analise.py --tamanhos 1000 100000 1000000 --saida resultados.json
+    python benchmarks/bench_analise.py --tamanhos 1000 --comparar resultados_anteriores.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from analise_financeira import AnaliseFinanceira
+
+TAMANHOS_PADRAO = [1_000, 100_000, 1_000_000]
+TOLERANCIA_REGRESSAO = 0.20  # 20% mais lento (ou mais memória) que a referência
+
+
+def medir(funcao: Callable, repeticoes: int, medir_memoria: bool) -> Dict:
+    # Tempo: melhor de N execuções sem tracemalloc (que distorce o tempo).
+    # Memória: uma execução extra com tracemalloc para o pico de alocação.
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    resultado = {'segundos': min(tempos), 'segundos_mediana': float(np.median(tempos))}
+    if medir_memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        resultado['pico_memoria_bytes'] = pico
+    return resultado
+
+
+def executar(tamanhos: List[int], repeticoes: int, medir_memoria: bool, semente: int) -> List[Dict]:
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for n in tamanhos:
+            analise = AnaliseFinanceira()
+            analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0, 'programa': 180.0})
+            planilha = os.path.join(pasta, f'catalogo_{n}.xlsx')
+            analise.criar_template_excel(planilha, n_produtos=n, semente=semente)
+
+            analise.carregar_produtos_excel(planilha)
+            df_resultados = analise.calcular_preco_lote()
+            saida = os.path.join(pasta, f'relatorio_{n}.xlsx')
+
+            etapas = {
+                'carregar_produtos_excel': lambda: analise.carregar_produtos_excel(planilha),
+                'calcular_preco_lote': analise.calcular_preco_lote,
+                'gerar_relatorio': lambda: analise.gerar_relatorio(df_resultados),
+                'exportar_resultados': lambda: analise.exportar_resultados(df_resultados, saida, streaming=True),
+            }
+            for etapa, funcao in etapas.items():
+                # Etapas de arquivo são lentas demais para repetir nos tamanhos grandes
+                n_repeticoes = repeticoes if etapa in ('calcular_preco_lote', 'gerar_relatorio') else 1
+                medida = medir(funcao, n_repeticoes, medir_memoria)
+                medida.update({'etapa': etapa, 'linhas': n})
+                medida['linhas_por_segundo'] = n / medida['segundos'] if medida['segundos'] > 0 else None
+                resultados.append(medida)
+                print(f"{etapa:<26} {n:>9} linhas  {medida['segundos']:9.4f} s"
+                      + (f"  {medida['pico_memoria_bytes'] / 2**20:9.1f} MiB" if medir_memoria else ''))
+    return resultados
+
+
+def versao_codigo() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or 'desconhecida'
+    except OSError:
+        return 'desconhecida'
+
+
+def comparar(atual: List[Dict], referencia: List[Dict]) -> List[str]:
+    # Aponta etapas que ficaram mais lentas ou gastaram mais memória que a referência
+    indice = {(r['etapa'], r['linhas']): r for r in referencia}
+    regressoes = []
+    for medida in atual:
+        anterior = indice.get((medida['etapa'], medida['linhas']))
+        if anterior is None:
+            continue
+        for campo in ('segundos', 'pico_memoria_bytes'):
+            if campo in medida and anterior.get(campo):
+                razao = medida[campo] / anterior[campo]
+                if razao > 1 + TOLERANCIA_REGRESSAO:
+                    regressoes.append(f"{medida['etapa']} ({medida['linhas']} linhas): {campo} {razao:.2f}x a referência")
+    return regressoes
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de AnaliseFinanceira com catálogos sintéticos.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--sem-memoria', action='store_true', help="Não mede o pico de memória")
+    parser.add_argument('--saida', default='bench_resultados.json', help="Arquivo JSON com os resultados")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para detectar regressões")
+    args = parser.parse_args(argv)
+
+    resultados = executar(args.tamanhos, args.repeticoes, not args.sem_memoria, args.semente)
+    documento = {
+        'versao': versao_codigo(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'resultados': resultados,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(documento, f, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em: {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            referencia = json.load(f)['resultados']
+        regressoes = comparar(resultados, referencia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO: {regressao}")
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
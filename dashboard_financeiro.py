@@ -1,7 +1,13 @@
+import contextlib
+import hashlib
+import io
+import multiprocessing
+import numpy as np
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from analise_financeira import AnaliseFinanceira
+from analise_financeira import ESCADA_PADRAO, AnaliseFinanceira, ConfiguracaoPreco, Instrumentacao, para_centavos
+from historico_precos import HistoricoPrecos
 
 st.set_page_config(
     page_title="Análise de Preços Inteligente",
@@ -9,11 +15,150 @@ st.set_page_config(
     layout="wide"
 )
 
-@st.cache_resource
 def inicializar_sistema():
-    return AnaliseFinanceira()
+    # Uma instância por sessão: cada caixa tem seus próprios custos e margem,
+    # sem sobrescrever as configurações das outras sessões. Ela guarda também o
+    # lote da tela já precificado, e definir_custos_fixos/definir_margem_lucro na
+    # barra lateral só reprecificam as colunas que dependem deles (_reprecificar).
+    if 'analise' not in st.session_state:
+        st.session_state['analise'] = AnaliseFinanceira()
+    return st.session_state['analise']
+
+def medir(etapa: str):
+    # Sem o painel de desempenho ligado, não mede nada
+    instrumentacao = st.session_state.get('instrumentacao')
+    if instrumentacao is None:
+        return contextlib.nullcontext({})
+    return instrumentacao.etapa(etapa)
+
+def nova_analise() -> AnaliseFinanceira:
+    # Instâncias locais das funções em cache reportam para o painel da sessão.
+    # Em um acerto de cache a função nem roda, e nada é medido (não houve custo).
+    analise = AnaliseFinanceira()
+    instrumentacao = st.session_state.get('instrumentacao')
+    if instrumentacao is not None:
+        analise.ativar_instrumentacao(instrumentacao=instrumentacao)
+    return analise
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def carregar_catalogo(conteudo: tuple) -> tuple:
+    # conteudo: tupla de (nome do arquivo, bytes), uma entrada por planilha enviada.
+    # Devolve os produtos limpos e o relatório de validação da carga.
+    analise = nova_analise()
+    if len(conteudo) == 1 and not conteudo[0][0].lower().endswith('.csv'):
+        # Planilhas já processadas são recarregadas do cache em disco
+        analise.ativar_cache('.cache_catalogos')
+        produtos = analise.carregar_produtos_excel(io.BytesIO(conteudo[0][1]))
+        return produtos, analise.relatorio_validacao
+
+    arquivos = []
+    for nome, dados in conteudo:
+        arquivo = io.BytesIO(dados)
+        arquivo.name = nome
+        arquivos.append(arquivo)
+    # Processos iniciados sem fork: fork de dentro do servidor multithread do Streamlit pode
+    # travar, e threads não leem xlsx em paralelo (o openpyxl é Python puro, preso ao GIL)
+    metodo = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    produtos = analise.carregar_varios_arquivos(arquivos, mp_context=multiprocessing.get_context(metodo))
+    return produtos, analise.relatorio_validacao
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def precificar_lote(conteudo: tuple, configuracao: ConfiguracaoPreco, escada: tuple = None) -> pd.DataFrame:
+    # Chave do cache: bytes do arquivo + fotografia imutável das configurações.
+    # A instância é local à chamada, então sessões concorrentes não interferem.
+    # Usada pelas exportações e pela simulação; a tela usa o lote da sessão (lote_da_sessao).
+    analise = nova_analise()
+    analise.produtos = carregar_catalogo(conteudo)[0]
+    df_resultados = analise.calcular_preco_lote(configuracao)
+    return analise.aplicar_escada_precos(df_resultados, escada) if escada else df_resultados
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def gerar_relatorio_excel(conteudo: tuple, configuracao: ConfiguracaoPreco, escada: tuple = None,
+                          parametros_simulacao: tuple = None) -> bytes:
+    # Relatório montado em memória (sem arquivo em disco) e reaproveitado
+    # enquanto a planilha e as configurações forem as mesmas.
+    # parametros_simulacao: (venda_padrao, agrupar_por, n_simulacoes) da última simulação
+    # rodada na aba Simulação; a simulação vem do cache e vira a planilha Simulacao_Monte_Carlo.
+    analise = nova_analise()
+    analise.aplicar_configuracao(configuracao)
+    monte_carlo = None
+    if parametros_simulacao is not None:
+        monte_carlo = simular_monte_carlo_lote(conteudo, configuracao, *parametros_simulacao, escada)
+    return analise.exportar_resultados(precificar_lote(conteudo, configuracao, escada), io.BytesIO(),
+                                       monte_carlo=monte_carlo)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def exportar_tabela(conteudo: tuple, configuracao: ConfiguracaoPreco, formato: str, escada: tuple = None) -> bytes:
+    # Parquet/CSV para ERP e BI: só a tabela de produtos, sem formatação nem gráficos
+    analise = nova_analise()
+    analise.aplicar_configuracao(configuracao)
+    return analise.exportar_resultados(precificar_lote(conteudo, configuracao, escada), io.BytesIO(), formato=formato)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def simular_cenarios_lote(conteudo: tuple, margens: tuple, custos_fixos_totais: tuple) -> dict:
+    # Só os totais por cenário vão para o mapa de calor; o cubo por produto não é montado
+    analise = nova_analise()
+    analise.produtos = carregar_catalogo(conteudo)[0]
+    return analise.simular_cenarios(margens, custos_fixos_totais, por_produto=False)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def margem_para_lucro_lote(conteudo: tuple, configuracao: ConfiguracaoPreco, lucro_alvo: float) -> float:
+    # Tetos de preço vêm da coluna Preco_Maximo, quando a planilha tiver
+    analise = nova_analise()
+    analise.produtos = carregar_catalogo(conteudo)[0]
+    return analise.margem_para_lucro(lucro_alvo, configuracao=configuracao)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def simular_monte_carlo_lote(conteudo: tuple, configuracao: ConfiguracaoPreco, venda_padrao: tuple,
+                             agrupar_por: str, n_simulacoes: int, escada: tuple = None) -> dict:
+    # Semente fixa: o mesmo catálogo e as mesmas faixas dão sempre o mesmo resultado
+    analise = nova_analise()
+    analise.aplicar_configuracao(configuracao)
+    return analise.simular_monte_carlo(venda_padrao, agrupar_por=agrupar_por, n_simulacoes=n_simulacoes,
+                                       df_resultados=precificar_lote(conteudo, configuracao, escada))
+
+def lote_da_sessao(analise: AnaliseFinanceira, conteudo: tuple, escada: tuple = None) -> pd.DataFrame:
+    # Precificação completa só quando os arquivos mudam. Com os mesmos arquivos, os
+    # resultados da sessão já foram reprecificados pela barra lateral, em poucas
+    # operações de coluna, mesmo para configurações que nunca passaram pelo cache.
+    if analise.resultados is None or st.session_state.get('conteudo_lote') != conteudo:
+        analise.produtos = carregar_catalogo(conteudo)[0]
+        analise.instrumentacao = st.session_state.get('instrumentacao')
+        analise.calcular_preco_lote()
+        st.session_state['conteudo_lote'] = conteudo
+    return analise.aplicar_escada_precos(analise.resultados, escada) if escada else analise.resultados
+
+def formatar_reais(valores: pd.Series) -> pd.Series:
+    # Formatação vetorizada (operações de string por coluna) no estilo 'R${:,.2f}',
+    # arredondando meio para cima como no modo em centavos
+    numeros = valores.to_numpy(dtype=float)
+    centavos = para_centavos(np.abs(numeros))
+    sinal = np.where((numeros < 0) & (centavos > 0), '-', '')
+    inteiro = pd.Series(centavos // 100, index=valores.index).astype(str)
+    inteiro = inteiro.str.replace(r'\B(?=(\d{3})+(?!\d))', ',', regex=True)
+    fracao = pd.Series(centavos % 100, index=valores.index).astype(str).str.zfill(2)
+    return 'R$' + sinal + inteiro + '.' + fracao
+
+def histograma(valores: pd.Series, nbins: int, titulo: str, rotulo: str):
+    # Agrega no servidor com NumPy: só as contagens das faixas vão para o navegador
+    contagens, bordas = np.histogram(valores.to_numpy(dtype=float), bins=nbins)
+    df_faixas = pd.DataFrame({
+        rotulo: (bordas[:-1] + bordas[1:]) / 2,
+        'count': contagens,
+        'faixa': [f"{inicio:,.2f} – {fim:,.2f}" for inicio, fim in zip(bordas[:-1], bordas[1:])],
+    })
+    fig = px.bar(df_faixas, x=rotulo, y='count', hover_data=['faixa'], title=titulo)
+    fig.update_traces(width=np.diff(bordas))
+    fig.update_layout(bargap=0)
+    return fig
+
+@st.cache_resource
+def abrir_historico() -> HistoricoPrecos:
+    # Só guarda o caminho do banco; cada operação abre a própria conexão
+    return HistoricoPrecos('historico_precos.db')
 
 analise = inicializar_sistema()
+historico = abrir_historico()
 
 st.title("💡 Análise de Preços Inteligente")
 st.markdown("Uma ferramenta para precificar lotes de produtos de forma rápida e realista.")
@@ -42,6 +187,21 @@ with st.sidebar:
         help="A margem de lucro sobre o preço de venda."
     )
     analise.definir_margem_lucro(margem_desejada / 100.0)
+    arredondar = st.checkbox(
+        "Arredondar para preços de prateleira", value=False,
+        help="x,49 e x,99 até R$ 10; x,99 até R$ 100; reais inteiros até R$ 1.000; dezenas acima. "
+             "O preço só sobe, então a margem nunca fica abaixo da desejada."
+    )
+    escada = ESCADA_PADRAO if arredondar else None
+
+    st.subheader("3. Diagnóstico")
+    mostrar_desempenho = st.checkbox("Mostrar painel de desempenho", value=False)
+    if mostrar_desempenho:
+        # Registros valem só para esta execução do script. Só tempo: o tracemalloc é do
+        # processo inteiro e pesaria nas outras sessões; pico de memória fica para o benchmark.
+        st.session_state.setdefault('instrumentacao', Instrumentacao()).limpar()
+    else:
+        st.session_state.pop('instrumentacao', None)
 
 # --- Área Principal ---
 
@@ -65,21 +225,40 @@ with col1:
             with calc_col2:
                 st.metric("Quantidade Total", f"{quantidade_total} un.")
             st.info("Use estes valores nas colunas 'Custo_Compra' e 'Quantidade' da sua planilha.")
+    st.caption("Para a planilha inteira, preencha as colunas 'Custo_Pacote', 'Unidades_Pacote' e "
+               "'Qtd_Pacotes' nas linhas compradas por caixa: a conversão é feita ao carregar.")
 
 with col2:
     st.subheader("Precificação de Lote")
-    uploaded_file = st.file_uploader(
-        "Carregue sua planilha para precificar (Nome_Produto, Custo_Compra, Quantidade)",
-        type=['xlsx', 'xls']
+    uploaded_files = st.file_uploader(
+        "Carregue suas planilhas para precificar (Nome_Produto, Custo_Compra, Quantidade; "
+        "ou Custo_Pacote, Unidades_Pacote, Qtd_Pacotes para compras por caixa). "
+        "Todas as abas de todos os arquivos entram no mesmo lote.",
+        type=['xlsx', 'xls', 'csv'],
+        accept_multiple_files=True
     )
 
 # --- Resultados ---
-if uploaded_file is not None:
+if uploaded_files:
     try:
-        df_produtos = analise.carregar_produtos_excel(uploaded_file)
-        df_resultados = analise.calcular_preco_lote()
+        conteudo = tuple((arquivo.name, arquivo.getvalue()) for arquivo in uploaded_files)
+        configuracao = analise.configuracao()
+        df_resultados = lote_da_sessao(analise, conteudo, escada)
 
         st.header("Resultados da Precificação do Lote")
+
+        validacao = carregar_catalogo(conteudo)[1]
+        if not validacao.empty:
+            descartadas = int((validacao['coluna'] == 'Custo_Compra').sum())
+            st.warning(f"{len(validacao)} valores da planilha não puderam ser lidos "
+                       f"({descartadas} linhas descartadas por falta de custo).")
+            with st.expander("Ver relatório de validação"):
+                # Linha 1 da planilha é o cabeçalho
+                df_validacao = validacao.assign(linha=validacao['linha'] + 2).rename(columns={
+                    'linha': 'Linha na planilha', 'coluna': 'Coluna',
+                    'valor_original': 'Valor original', 'motivo': 'Motivo'
+                })
+                st.dataframe(df_validacao, hide_index=True, use_container_width=True)
         
         # Resumo
         total_itens = df_resultados['Quantidade'].sum()
@@ -90,52 +269,207 @@ if uploaded_file is not None:
         resumo_col1.metric("Total de Itens no Lote", f"{total_itens} unidades")
         resumo_col2.metric("Receita Estimada do Lote", f"R$ {receita_estimada:,.2f}")
         resumo_col3.metric("Lucro Estimado do Lote", f"R$ {lucro_estimado:,.2f}")
-        
-        tab1, tab2, tab3 = st.tabs(["📄 Tabela de Preços", "📊 Gráficos", "📥 Exportar"])
+        if escada and receita_estimada:
+            st.caption(f"Margem efetiva com preços de prateleira: {lucro_estimado / receita_estimada:.1%} "
+                       f"(desejada: {configuracao.margem_lucro:.0%})")
+
+        tab1, tab2, tab3, tab_simulacao, tab4, tab5 = st.tabs(
+            ["📄 Tabela de Preços", "📊 Gráficos", "🧮 Cenários", "🎲 Simulação", "📈 Histórico", "📥 Exportar"]
+        )
 
         with tab1:
             st.write("**Preços Sugeridos por Unidade:**")
-            df_display = df_resultados[[
-                'Nome_Produto', 'Custo_Compra_Unitario',
-                'custo_fixo_alocado_unitario', 'custo_total_unitario', 'preco_venda_unitario', 'lucro_unitario'
-            ]].copy()
-            df_display.columns = [
-                'Produto', 'Custo Compra',
-                'Custo Fixo Adic.', 'Custo Final', 'Preço Venda', 'Lucro Unid.'
-            ]
-            st.dataframe(df_display.style.format({
-                'Custo Compra': 'R${:,.2f}',
-                'Custo Fixo Adic.': 'R${:,.2f}',
-                'Custo Final': 'R${:,.2f}',
-                'Preço Venda': 'R${:,.2f}',
-                'Lucro Unid.': 'R${:,.2f}'
-            }))
+            colunas_tabela = {
+                'Nome_Produto': 'Produto', 'Custo_Compra_Unitario': 'Custo Compra',
+                'custo_fixo_alocado_unitario': 'Custo Fixo Adic.', 'custo_total_unitario': 'Custo Final',
+                'preco_venda_unitario': 'Preço Venda', 'lucro_unitario': 'Lucro Unid.'
+            }
+            # Busca, ordenação e paginação no servidor: só a página atual é formatada e enviada
+            filtro_col1, filtro_col2, filtro_col3, filtro_col4 = st.columns([2, 1.2, 0.8, 0.8])
+            with filtro_col1:
+                busca = st.text_input("Buscar produto", key="busca_produto")
+            with filtro_col2:
+                ordenar_por = st.selectbox("Ordenar por", list(colunas_tabela), format_func=colunas_tabela.get)
+            with filtro_col3:
+                decrescente = st.checkbox("Decrescente", value=False)
+            with filtro_col4:
+                tamanho_pagina = st.selectbox("Linhas por página", [25, 50, 100, 250], index=1)
+
+            with medir('tabela_precos') as medida:
+                df_tabela = df_resultados[list(colunas_tabela)]
+                if busca:
+                    encontrados = df_tabela['Nome_Produto'].astype(str).str.contains(busca, case=False, regex=False)
+                    df_tabela = df_tabela[encontrados.to_numpy()]
+                df_tabela = df_tabela.sort_values(ordenar_por, ascending=not decrescente, kind='stable')
+
+                total_paginas = max(1, -(-len(df_tabela) // tamanho_pagina))
+                pagina = st.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1, step=1)
+                inicio = (pagina - 1) * tamanho_pagina
+                df_pagina = df_tabela.iloc[inicio:inicio + tamanho_pagina]
+
+                df_display = pd.DataFrame({'Produto': df_pagina['Nome_Produto']})
+                for coluna, titulo in list(colunas_tabela.items())[1:]:
+                    df_display[titulo] = formatar_reais(df_pagina[coluna])
+                medida['linhas'] = len(df_display)
+                st.dataframe(df_display, hide_index=True, use_container_width=True)
+                st.caption(f"{len(df_tabela):,} produtos encontrados")
 
         with tab2:
             st.subheader("Análises Visuais do Lote")
             col_graph1, col_graph2 = st.columns(2)
-            with col_graph1:
-                fig_lucro = px.bar(df_resultados.sort_values('lucro_total', ascending=False).head(15), x='Nome_Produto', y='lucro_total', title='Top 15 Produtos por Lucro Total')
+            with medir('graficos') as medida, col_graph1:
+                medida['linhas'] = len(df_resultados)
+                fig_lucro = px.bar(df_resultados.nlargest(15, 'lucro_total'), x='Nome_Produto', y='lucro_total', title='Top 15 Produtos por Lucro Total')
                 st.plotly_chart(fig_lucro, use_container_width=True)
-                fig_custo_compra = px.histogram(df_resultados, x='Custo_Compra_Unitario', nbins=10, title='Distribuição dos Custos de Compra')
+                fig_custo_compra = histograma(df_resultados['Custo_Compra_Unitario'], 10, 'Distribuição dos Custos de Compra', 'Custo_Compra_Unitario')
                 st.plotly_chart(fig_custo_compra, use_container_width=True)
-            with col_graph2:
-                fig_receita = px.bar(df_resultados.sort_values('preco_venda_total', ascending=False).head(15), x='Nome_Produto', y='preco_venda_total', title='Top 15 Produtos por Receita Total')
+            with medir('graficos') as medida, col_graph2:
+                medida['linhas'] = len(df_resultados)
+                fig_receita = px.bar(df_resultados.nlargest(15, 'preco_venda_total'), x='Nome_Produto', y='preco_venda_total', title='Top 15 Produtos por Receita Total')
                 st.plotly_chart(fig_receita, use_container_width=True)
-                fig_lucro_unitario = px.histogram(df_resultados, x='lucro_unitario', nbins=10, title='Distribuição do Lucro por Unidade')
+                fig_lucro_unitario = histograma(df_resultados['lucro_unitario'], 10, 'Distribuição do Lucro por Unidade', 'lucro_unitario')
                 st.plotly_chart(fig_lucro_unitario, use_container_width=True)
 
         with tab3:
+            st.subheader("Sensibilidade: Margem × Custos Fixos")
+            custo_fixo_atual = configuracao.custo_fixo_mensal_total
+            cen_col1, cen_col2 = st.columns(2)
+            with cen_col1:
+                faixa_margem = st.slider("Faixa de margem (%)", min_value=1, max_value=95, value=(10, 50), step=1)
+            with cen_col2:
+                faixa_custos = st.slider(
+                    "Faixa de custos fixos mensais (R$)", min_value=0.0,
+                    max_value=max(custo_fixo_atual * 3, 1000.0),
+                    value=(custo_fixo_atual * 0.5, custo_fixo_atual * 1.5), step=100.0
+                )
+            margens = tuple(np.linspace(faixa_margem[0], faixa_margem[1], 21) / 100)
+            custos_totais = tuple(np.linspace(faixa_custos[0], faixa_custos[1], 21))
+            cenarios = simular_cenarios_lote(conteudo, margens, custos_totais)
+
+            fig_cenarios = px.imshow(
+                cenarios['lucro_total'][:, :, 0],
+                x=[f"R$ {c:,.0f}" for c in custos_totais],
+                y=[f"{m * 100:.0f}%" for m in margens],
+                labels={'x': 'Custos Fixos Mensais', 'y': 'Margem', 'color': 'Lucro (R$)'},
+                color_continuous_scale='RdYlGn', aspect='auto', origin='lower',
+                title='Lucro Estimado do Lote por Cenário'
+            )
+            st.plotly_chart(fig_cenarios, use_container_width=True)
+
+            st.subheader("Margem Necessária para uma Meta de Lucro")
+            meta_col1, meta_col2 = st.columns(2)
+            with meta_col1:
+                lucro_alvo = st.number_input("Lucro desejado para o lote (R$)", min_value=0.0,
+                                             value=float(round(lucro_estimado, 2)), step=50.0)
+            margem_necessaria = margem_para_lucro_lote(conteudo, configuracao, lucro_alvo)
+            with meta_col2:
+                if np.isnan(margem_necessaria):
+                    st.warning("Meta inatingível mesmo com margem de 99% (verifique os preços máximos).")
+                else:
+                    st.metric("Margem necessária", f"{margem_necessaria * 100:.2f}%",
+                              delta=f"{(margem_necessaria - configuracao.margem_lucro) * 100:+.2f} p.p.",
+                              delta_color="off")
+
+        with tab_simulacao:
+            st.subheader("Lucro com Venda Incerta (Monte Carlo)")
+            st.caption("Fração do lote vendida: pessimista, mais provável e otimista. Sobras não têm valor residual.")
+            # Formulário: mexer nos controles não dispara a simulação, só o botão
+            with st.form("form_simulacao"):
+                sim_col1, sim_col2, sim_col3 = st.columns([2, 1, 1])
+                with sim_col1:
+                    faixa_venda = st.slider("Venda pessimista – otimista (%)", min_value=0, max_value=100,
+                                            value=(50, 100), step=5)
+                    venda_provavel = st.slider("Venda mais provável (%)", min_value=0, max_value=100,
+                                               value=80, step=1, help="Limitada à faixa pessimista – otimista.")
+                with sim_col2:
+                    n_simulacoes = st.selectbox("Simulações", [10_000, 100_000], index=0)
+                with sim_col3:
+                    # Um sorteio por categoria é bem mais leve que um por produto
+                    tem_categoria = 'Categoria' in df_resultados.columns
+                    por_categoria = st.checkbox("Sorteio por categoria", value=tem_categoria,
+                                                disabled=not tem_categoria)
+                rodar_simulacao = st.form_submit_button("Rodar simulação")
+
+            # Chave da simulação: conteúdo dos arquivos (hash), configurações e preços de prateleira.
+            # Se algo mudar, o resultado antigo deixa de ser mostrado (e exportado).
+            chave_simulacao = (tuple((nome, hashlib.sha256(dados).hexdigest()) for nome, dados in conteudo),
+                               configuracao, escada)
+            if rodar_simulacao:
+                venda_provavel = min(max(venda_provavel, faixa_venda[0]), faixa_venda[1])
+                venda_padrao = (faixa_venda[0] / 100, venda_provavel / 100, faixa_venda[1] / 100)
+                st.session_state['parametros_simulacao'] = (
+                    chave_simulacao, (venda_padrao, 'Categoria' if por_categoria and tem_categoria else None, n_simulacoes)
+                )
+            parametros_simulacao = None
+            chave_anterior, parametros = st.session_state.get('parametros_simulacao', (None, None))
+            if chave_anterior == chave_simulacao:
+                parametros_simulacao = parametros
+
+            if parametros_simulacao is None:
+                st.info("Ajuste as faixas e clique em **Rodar simulação**.")
+            else:
+                simulacao = simular_monte_carlo_lote(conteudo, configuracao, *parametros_simulacao, escada)
+                mc_col1, mc_col2, mc_col3, mc_col4 = st.columns(4)
+                mc_col1.metric("Lucro Médio", f"R$ {simulacao['lucro_medio']:,.2f}")
+                mc_col2.metric("Lucro P5 (pessimista)", f"R$ {simulacao['percentis'][5]:,.2f}")
+                mc_col3.metric("Lucro P95 (otimista)", f"R$ {simulacao['percentis'][95]:,.2f}")
+                mc_col4.metric("Chance de Prejuízo", f"{simulacao['probabilidade_prejuizo']:.1%}")
+                fig_simulacao = histograma(pd.Series(simulacao['lucros']), 50, 'Distribuição do Lucro do Lote', 'lucro')
+                st.plotly_chart(fig_simulacao, use_container_width=True)
+
+        with tab4:
+            st.subheader("Histórico de Preços")
+            if st.button("Salvar este lote no histórico"):
+                execucao_id = historico.registrar_execucao(df_resultados, configuracao)
+                st.success(f"Lote salvo no histórico (execução nº {execucao_id}).")
+
+            hist_col1, hist_col2 = st.columns([1, 2])
+            with hist_col1:
+                termo = st.text_input("Início do nome do produto", key="busca_historico")
+                opcoes = historico.buscar_produtos(termo)
+                produto_escolhido = st.selectbox("Produto", opcoes) if opcoes else None
+            with hist_col2:
+                if produto_escolhido:
+                    df_historico = historico.historico_produto(produto_escolhido)
+                    df_historico['data_execucao'] = pd.to_datetime(df_historico['data_execucao'])
+                    fig_historico = px.line(
+                        df_historico, x='data_execucao', y=['preco_venda_unitario', 'custo_total_unitario'],
+                        markers=True, title=f'Histórico de Preço: {produto_escolhido}'
+                    )
+                    st.plotly_chart(fig_historico, use_container_width=True)
+                else:
+                    st.write("Nenhum produto no histórico ainda.")
+
+        with tab5:
             st.subheader("Exportar Relatório Completo para Excel")
+            if parametros_simulacao is not None:
+                st.caption("A última simulação da aba Simulação entra no relatório (planilha Simulacao_Monte_Carlo).")
             if st.button("Gerar e Baixar Relatório Excel"):
-                analise.exportar_resultados(df_resultados, 'relatorio_financeiro.xlsx')
-                with open('relatorio_financeiro.xlsx', 'rb') as f:
-                    st.download_button(
-                        label="Clique para Baixar o Excel",
-                        data=f.read(),
-                        file_name="relatorio_financeiro.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                st.download_button(
+                    label="Clique para Baixar o Excel",
+                    data=gerar_relatorio_excel(conteudo, configuracao, escada, parametros_simulacao),
+                    file_name="relatorio_financeiro.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+
+            st.subheader("Exportar Tabela de Preços (ERP/BI)")
+            formato_tabela = st.selectbox("Formato", ['parquet', 'csv'], format_func=lambda f: f".{f}")
+            if st.button("Gerar Tabela"):
+                st.download_button(
+                    label=f"Clique para Baixar o .{formato_tabela}",
+                    data=exportar_tabela(conteudo, configuracao, formato_tabela, escada),
+                    file_name=f"precos.{formato_tabela}",
+                    mime="application/octet-stream" if formato_tabela == 'parquet' else "text/csv"
+                )
 
     except Exception as e:
-        st.error(f"Ocorreu um erro ao processar o arquivo: {e}")
\ No newline at end of file
+        st.error(f"Ocorreu um erro ao processar o arquivo: {e}")
+
+# --- Painel de Desempenho ---
+if st.session_state.get('instrumentacao') is not None:
+    with st.expander("⏱️ Desempenho", expanded=True):
+        registros = st.session_state['instrumentacao'].registros
+        if registros:
+            st.dataframe(pd.DataFrame(registros))
+        else:
+            st.write("Nenhuma etapa foi executada nesta interação (resultados vieram do cache).")
\ No newline at end of file
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Histórico de precificações em SQLite (um banco local, sem servidor)
+"""
+
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from analise_financeira import ConfiguracaoPreco, centavos_para_reais
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data_execucao TEXT NOT NULL,
+    margem_lucro REAL NOT NULL,
+    custos_fixos TEXT NOT NULL,
+    custo_fixo_mensal_total REAL NOT NULL,
+    total_produtos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS precos (
+    execucao_id INTEGER NOT NULL REFERENCES execucoes(id) ON DELETE CASCADE,
+    data_execucao TEXT NOT NULL,
+    nome_produto TEXT NOT NULL,
+    custo_compra_unitario REAL,
+    quantidade REAL,
+    custo_fixo_alocado_unitario REAL,
+    custo_total_unitario REAL,
+    preco_venda_unitario REAL,
+    lucro_unitario REAL,
+    margem_lucro REAL
+);
+CREATE INDEX IF NOT EXISTS idx_precos_produto_data ON precos (nome_produto, data_execucao);
+CREATE INDEX IF NOT EXISTS idx_precos_data ON precos (data_execucao);
+CREATE INDEX IF NOT EXISTS idx_precos_execucao ON precos (execucao_id);
+CREATE INDEX IF NOT EXISTS idx_execucoes_data ON execucoes (data_execucao);
+"""
+
+COLUNAS_PRECO = [
+    'Nome_Produto', 'Custo_Compra_Unitario', 'Quantidade', 'custo_fixo_alocado_unitario',
+    'custo_total_unitario', 'preco_venda_unitario', 'lucro_unitario'
+]
+
+
+class HistoricoPrecos:
+    def __init__(self, caminho: str = 'historico_precos.db'):
+        self.caminho = caminho
+        with closing(self._conectar()) as conexao:
+            # WAL: leituras (ex.: o dashboard) não bloqueiam enquanto um lote é gravado
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(ESQUEMA)
+
+    def _conectar(self) -> sqlite3.Connection:
+        # Uma conexão por operação: seguro para usar a partir de várias threads
+        conexao = sqlite3.connect(self.caminho)
+        conexao.execute("PRAGMA foreign_keys=ON")
+        return conexao
+
+    def registrar_execucao(self, df_resultados: pd.DataFrame, configuracao: ConfiguracaoPreco,
+                           data_execucao: Optional[datetime] = None) -> int:
+        # Grava o lote inteiro em uma única transação (executemany), devolvendo o id da execução
+        df = centavos_para_reais(df_resultados)
+        data = (data_execucao or datetime.now()).isoformat(timespec='seconds')
+
+        linhas = df[COLUNAS_PRECO].astype({'Nome_Produto': str}).itertuples(index=False, name=None)
+        with closing(self._conectar()) as conexao, conexao:
+            cursor = conexao.execute(
+                "INSERT INTO execucoes (data_execucao, margem_lucro, custos_fixos, custo_fixo_mensal_total, total_produtos)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (data, configuracao.margem_lucro, json.dumps(dict(configuracao.custos_fixos), ensure_ascii=False),
+                 configuracao.custo_fixo_mensal_total, len(df))
+            )
+            execucao_id = cursor.lastrowid
+            conexao.executemany(
+                "INSERT INTO precos (execucao_id, data_execucao, nome_produto, custo_compra_unitario, quantidade,"
+                " custo_fixo_alocado_unitario, custo_total_unitario, preco_venda_unitario, lucro_unitario, margem_lucro)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((execucao_id, data, nome, float(custo), float(quantidade), float(fixo), float(total), float(preco),
+                  float(lucro), configuracao.margem_lucro)
+                 for nome, custo, quantidade, fixo, total, preco, lucro in linhas)
+            )
+        return execucao_id
+
+    def listar_execucoes(self) -> pd.DataFrame:
+        with closing(self._conectar()) as conexao:
+            return pd.read_sql_query("SELECT * FROM execucoes ORDER BY data_execucao DESC, id DESC", conexao)
+
+    def buscar_produtos(self, termo: str = '', limite: int = 50) -> list:
+        # Busca por prefixo usa o índice de nome_produto
+        with closing(self._conectar()) as conexao:
+            cursor = conexao.execute(
+                "SELECT DISTINCT nome_produto FROM precos WHERE nome_produto >= ? AND nome_produto < ?"
+                " ORDER BY nome_produto LIMIT ?",
+                (termo, termo + '\uffff', limite)
+            )
+            return [linha[0] for linha in cursor.fetchall()]
+
+    def historico_produto(self, nome_produto: str, inicio: Optional[datetime] = None,
+                          fim: Optional[datetime] = None) -> pd.DataFrame:
+        consulta = "SELECT * FROM precos WHERE nome_produto = ?"
+        parametros = [nome_produto]
+        if inicio is not None:
+            consulta += " AND data_execucao >= ?"
+            parametros.append(inicio.isoformat(timespec='seconds'))
+        if fim is not None:
+            consulta += " AND data_execucao <= ?"
+            parametros.append(fim.isoformat(timespec='seconds'))
+        consulta += " ORDER BY data_execucao, execucao_id"
+        with closing(self._conectar()) as conexao:
+            return pd.read_sql_query(consulta, conexao, params=parametros)
+
+    def comparar_execucoes(self, execucao_anterior: int, execucao_atual: int) -> pd.DataFrame:
+        # Preço sugerido de cada produto nas duas execuções, lado a lado
+        consulta = """
+            SELECT atual.nome_produto,
+                   anterior.preco_venda_unitario AS preco_anterior,
+                   atual.preco_venda_unitario AS preco_atual,
+                   atual.preco_venda_unitario - anterior.preco_venda_unitario AS variacao
+            FROM precos AS atual
+            LEFT JOIN precos AS anterior
+                   ON anterior.nome_produto = atual.nome_produto AND anterior.execucao_id = ?
+            WHERE atual.execucao_id = ?
+            ORDER BY atual.nome_produto
+        """
+        with closing(self._conectar()) as conexao:
+            return pd.read_sql_query(consulta, conexao, params=[execucao_anterior, execucao_atual])
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Precificação em lote de várias lojas, em paralelo (um processo por loja)
+
+Uso:
+    python precificacao_lojas.py planilhas_lojas/ --saida relatorios/
+    python precificacao_lojas.py lojas.json --saida relatorios/ --processos 4
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import pandas as pd
+
+from analise_financeira import AnaliseFinanceira
+
+EXTENSOES_PLANILHA = ('.xlsx', '.xls')
+
+
+def lojas_do_diretorio(diretorio: str, margem: float = 0.25) -> List[Dict]:
+    # Cada planilha do diretório é uma loja. Custos fixos e margem vêm de um
+    # arquivo <loja>.json ao lado da planilha, se existir.
+    lojas = []
+    for nome in sorted(os.listdir(diretorio)):
+        loja, extensao = os.path.splitext(nome)
+        if extensao.lower() not in EXTENSOES_PLANILHA:
+            continue
+        config = {'custos_fixos': {}, 'margem': margem}
+        caminho_config = os.path.join(diretorio, f"{loja}.json")
+        if os.path.exists(caminho_config):
+            with open(caminho_config, encoding='utf-8') as f:
+                config.update(json.load(f))
+        lojas.append({'loja': loja, 'arquivo': os.path.join(diretorio, nome), **config})
+    return lojas
+
+
+def carregar_manifesto(caminho: str, margem: float = 0.25) -> List[Dict]:
+    # Manifesto JSON: lista de {"loja", "arquivo", "custos_fixos", "margem"}.
+    # Caminhos relativos são resolvidos a partir da pasta do manifesto.
+    with open(caminho, encoding='utf-8') as f:
+        entradas = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(caminho))
+    lojas = []
+    for entrada in entradas:
+        if 'loja' not in entrada or 'arquivo' not in entrada:
+            raise ValueError("Cada loja do manifesto precisa de 'loja' e 'arquivo'")
+        lojas.append({
+            'loja': entrada['loja'],
+            'arquivo': os.path.join(base, entrada['arquivo']),
+            'custos_fixos': entrada.get('custos_fixos', {}),
+            'margem': entrada.get('margem', margem),
+        })
+    return lojas
+
+
+def processar_loja(loja: Dict, diretorio_saida: str) -> Dict:
+    # Executado em um processo separado: carrega, precifica e exporta uma loja
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos(loja['custos_fixos'])
+    analise.definir_margem_lucro(loja['margem'])
+    analise.carregar_produtos_excel(loja['arquivo'])
+    df_resultados = analise.calcular_preco_lote()
+
+    arquivo_saida = os.path.join(diretorio_saida, f"relatorio_{loja['loja']}.xlsx")
+    analise.exportar_resultados(df_resultados, arquivo_saida)
+    relatorio = analise.gerar_relatorio(df_resultados, agrupar_por=[])
+    relatorio.pop('agrupamentos', None)
+    return {'loja': loja['loja'], 'arquivo_saida': arquivo_saida, **relatorio}
+
+
+def processar_lojas(lojas: List[Dict], diretorio_saida: str, max_processos: int = None) -> pd.DataFrame:
+    # Distribui as lojas entre os núcleos e consolida o resumo de todas.
+    # Uma loja com erro não interrompe as demais: o erro fica registrado no resumo.
+    os.makedirs(diretorio_saida, exist_ok=True)
+    linhas = []
+    with ProcessPoolExecutor(max_workers=max_processos) as executor:
+        futuros = {executor.submit(processar_loja, loja, diretorio_saida): loja for loja in lojas}
+        for futuro in as_completed(futuros):
+            loja = futuros[futuro]
+            try:
+                linhas.append({**futuro.result(), 'erro': None})
+            except Exception as e:
+                linhas.append({'loja': loja['loja'], 'erro': str(e)})
+
+    resumo = pd.DataFrame(linhas)
+    if not resumo.empty:
+        resumo = resumo.sort_values('loja').reset_index(drop=True)
+    resumo.to_excel(os.path.join(diretorio_saida, 'resumo_lojas.xlsx'), index=False, sheet_name='Resumo_Lojas')
+    return resumo
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Precifica as planilhas de várias lojas em paralelo.")
+    parser.add_argument('entrada', help="Diretório com uma planilha por loja ou manifesto JSON")
+    parser.add_argument('--saida', default='relatorios_lojas', help="Diretório dos relatórios gerados")
+    parser.add_argument('--processos', type=int, default=None, help="Número de processos (padrão: núcleos da máquina)")
+    parser.add_argument('--margem', type=float, default=0.25, help="Margem padrão para lojas sem configuração")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.entrada):
+        lojas = lojas_do_diretorio(args.entrada, args.margem)
+    else:
+        lojas = carregar_manifesto(args.entrada, args.margem)
+
+    resumo = processar_lojas(lojas, args.saida, args.processos)
+    print(resumo.to_string(index=False))
+    print(f"Resumo consolidado: {os.path.join(args.saida, 'resumo_lojas.xlsx')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serviço HTTP/JSON local de preços sugeridos (asyncio, só biblioteca padrão)
+
+Requisições que chegam juntas (dentro de uma janela curta) são agrupadas em um
+único cálculo vetorizado. Uso:
+    python servico_precos.py --margem 0.3 --custos custos.json --itens-lote 500 --porta 8080
+
+    curl -X POST localhost:8080/preco -d '{"nome": "Arroz 5kg", "custo": 15.5}'
+    curl -X POST localhost:8080/precos -d '{"produtos": [{"nome": "Arroz 5kg", "custo": 15.5}]}'
+    curl localhost:8080/metricas
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from analise_financeira import AnaliseFinanceira, ConfiguracaoPreco
+
+CAMPOS_PRECO = [
+    'custo_produto_unitario', 'custo_fixo_alocado_unitario', 'custo_total_unitario',
+    'preco_venda_unitario', 'lucro_unitario'
+]
+MENSAGENS_STATUS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error'
+}
+TAMANHO_MAXIMO_CORPO = 64 * 1024 * 1024
+
+
+class ServicoPrecos:
+    def __init__(self, configuracao: ConfiguracaoPreco, total_itens_lote: float = 0, janela_ms: float = 2.0,
+                 max_itens_lote: int = 100_000, amostras_latencia: int = 10_000):
+        # O custo fixo por unidade é rateado pelo total de itens esperado no lote (0 = sem rateio)
+        self.configuracao = configuracao
+        self.analise = AnaliseFinanceira()
+        self.custo_fixo_por_produto = self.analise._custo_fixo_por_produto(total_itens_lote, configuracao)
+        self.janela = janela_ms / 1000
+        self.max_itens_lote = max_itens_lote
+
+        self.requisicoes = 0
+        self.lotes = 0
+        self.produtos = 0
+        self._pendentes = 0
+        self._latencias = deque(maxlen=amostras_latencia)
+        self._fila = None
+        self._servidor = None
+        self._tarefa_lotes = None
+
+    async def iniciar(self, host: str = '127.0.0.1', porta: int = 8080) -> int:
+        # Devolve a porta em uso (útil com porta=0, que escolhe uma livre)
+        self._fila = asyncio.Queue()
+        self._tarefa_lotes = asyncio.create_task(self._processar_lotes())
+        self._servidor = await asyncio.start_server(self._atender_conexao, host, porta)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def parar(self):
+        self._servidor.close()
+        await self._servidor.wait_closed()
+        self._tarefa_lotes.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._tarefa_lotes
+
+    async def servir(self, host: str = '127.0.0.1', porta: int = 8080):
+        porta = await self.iniciar(host, porta)
+        print(f"Serviço de preços em http://{host}:{porta} (margem {self.configuracao.margem_lucro:.0%})")
+        try:
+            await self._servidor.serve_forever()
+        finally:
+            await self.parar()
+
+    async def precificar(self, custos: np.ndarray) -> Dict[str, np.ndarray]:
+        # Entra na fila e espera o resultado do lote em que foi agrupado
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes += 1
+        try:
+            self._fila.put_nowait((custos, futuro))
+            return await futuro
+        finally:
+            self._pendentes -= 1
+
+    async def _processar_lotes(self):
+        # Junta o que chegar até o fim da janela (ou até max_itens_lote) e calcula tudo de uma vez
+        loop = asyncio.get_running_loop()
+        while True:
+            pedidos = [await self._fila.get()]
+            itens = len(pedidos[0][0])
+            prazo = loop.time() + self.janela
+            while itens < self.max_itens_lote:
+                restante = prazo - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    pedido = await asyncio.wait_for(self._fila.get(), restante)
+                except asyncio.TimeoutError:
+                    break
+                pedidos.append(pedido)
+                itens += len(pedido[0])
+
+            custos = np.concatenate([custos_pedido for custos_pedido, _ in pedidos])
+            try:
+                # NumPy libera o GIL: o loop continua aceitando conexões durante lotes grandes
+                resultado = await loop.run_in_executor(None, self._calcular, custos)
+            except Exception as e:
+                for _, futuro in pedidos:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+
+            self.lotes += 1
+            self.produtos += len(custos)
+            inicio = 0
+            for custos_pedido, futuro in pedidos:
+                fim = inicio + len(custos_pedido)
+                if not futuro.done():
+                    futuro.set_result({campo: valores[inicio:fim] for campo, valores in resultado.items()})
+                inicio = fim
+
+    def _calcular(self, custos: np.ndarray) -> Dict[str, np.ndarray]:
+        info_preco = self.analise.calcular_preco_venda(custos, self.custo_fixo_por_produto, self.configuracao)
+        return {campo: np.broadcast_to(np.asarray(info_preco[campo], dtype=float), custos.shape)
+                for campo in CAMPOS_PRECO}
+
+    def metricas(self) -> Dict:
+        latencias = np.array(self._latencias) * 1000
+        p50, p90, p99 = np.percentile(latencias, [50, 90, 99]) if len(latencias) else (0.0, 0.0, 0.0)
+        return {
+            'fila': self._pendentes,
+            'requisicoes': self.requisicoes,
+            'lotes': self.lotes,
+            'produtos': self.produtos,
+            'produtos_por_lote': self.produtos / self.lotes if self.lotes else 0.0,
+            'latencia_ms': {'p50': float(p50), 'p90': float(p90), 'p99': float(p99)},
+        }
+
+    def _ler_produtos(self, produtos) -> Tuple[List, np.ndarray]:
+        if not isinstance(produtos, list) or not all(isinstance(p, dict) for p in produtos):
+            raise ValueError("'produtos' deve ser uma lista de objetos")
+        try:
+            custos = np.array([p['custo'] for p in produtos], dtype=float)
+        except KeyError:
+            raise ValueError("Cada produto precisa do campo 'custo'")
+        except (TypeError, ValueError):
+            raise ValueError("'custo' deve ser numérico")
+        if not np.isfinite(custos).all():
+            raise ValueError("'custo' deve ser um número finito")
+        return [p.get('nome') for p in produtos], custos
+
+    async def _rotear(self, metodo: str, caminho: str, corpo: bytes) -> Tuple[int, Dict]:
+        if caminho == '/metricas':
+            if metodo != 'GET':
+                return 405, {'erro': "Use GET em /metricas"}
+            return 200, self.metricas()
+        if caminho not in ('/preco', '/precos'):
+            return 404, {'erro': f"Caminho desconhecido: {caminho}"}
+        if metodo != 'POST':
+            return 405, {'erro': f"Use POST em {caminho}"}
+
+        inicio = time.perf_counter()
+        self.requisicoes += 1
+        try:
+            dados = json.loads(corpo or b'null')
+            if caminho == '/preco':
+                produtos = [dados]
+            elif isinstance(dados, dict) and 'produtos' in dados:
+                produtos = dados['produtos']
+            else:
+                raise ValueError("Envie {\"produtos\": [...]}")
+            nomes, custos = self._ler_produtos(produtos)
+        except ValueError as e:
+            return 400, {'erro': str(e)}
+
+        resultado = await self.precificar(custos)
+        colunas = {campo: valores.tolist() for campo, valores in resultado.items()}
+        linhas = [{'nome': nome, **{campo: colunas[campo][i] for campo in CAMPOS_PRECO}}
+                  for i, nome in enumerate(nomes)]
+        self._latencias.append(time.perf_counter() - inicio)
+        return 200, linhas[0] if caminho == '/preco' else {'produtos': linhas}
+
+    async def _atender_conexao(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # HTTP/1.1 mínimo: várias requisições por conexão (keep-alive), corpo por Content-Length
+        try:
+            while True:
+                linha = await reader.readline()
+                if not linha:
+                    break
+                partes = linha.decode('latin-1').split()
+                if len(partes) != 3:
+                    await self._responder(writer, 400, {'erro': "Requisição inválida"}, manter=False)
+                    break
+                metodo, caminho, versao = partes
+
+                cabecalhos = {}
+                while True:
+                    linha = await reader.readline()
+                    if linha in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = linha.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = conexao == 'keep-alive' if versao == 'HTTP/1.0' else conexao != 'close'
+                tamanho = int(cabecalhos.get('content-length') or 0)
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    await self._responder(writer, 413, {'erro': "Corpo da requisição grande demais"}, manter=False)
+                    break
+                corpo = await reader.readexactly(tamanho) if tamanho else b''
+
+                try:
+                    status, resposta = await self._rotear(metodo, caminho.split('?', 1)[0], corpo)
+                except Exception as e:
+                    status, resposta = 500, {'erro': str(e)}
+                await self._responder(writer, status, resposta, manter)
+                if not manter:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def _responder(self, writer: asyncio.StreamWriter, status: int, resposta: Dict, manter: bool):
+        dados = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+        cabecalho = (
+            f"HTTP/1.1 {status} {MENSAGENS_STATUS[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(dados)}\r\n"
+            f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n"
+        )
+        writer.write(cabecalho.encode('latin-1') + dados)
+        await writer.drain()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Serviço HTTP local de preços sugeridos.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--margem', type=float, default=0.25, help="Margem de lucro sobre o preço de venda")
+    parser.add_argument('--custos', help="JSON com os custos fixos mensais (ex.: {\"aluguel\": 900})")
+    parser.add_argument('--itens-lote', type=float, default=0,
+                        help="Total de itens do lote, para ratear o custo fixo diário (0 = sem rateio)")
+    parser.add_argument('--janela-ms', type=float, default=2.0,
+                        help="Tempo de espera para agrupar requisições em um lote")
+    args = parser.parse_args(argv)
+
+    custos = {}
+    if args.custos:
+        with open(args.custos, encoding='utf-8') as f:
+            custos = json.load(f)
+    configuracao = ConfiguracaoPreco.criar(custos, args.margem)
+    servico = ServicoPrecos(configuracao, args.itens_lote, args.janela_ms)
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(servico.servir(args.host, args.porta))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Garantir que o diretório do projeto esteja no path para importar o módulo
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import pandas as pd
+
+from analise_financeira import AnaliseFinanceira
+
+
+def _criar_planilha(caminho, n):
+    pd.DataFrame({
+        'Nome_Produto': [f'Produto {i}' for i in range(n)],
+        'Custo_Compra': [1.5 + i for i in range(n)],
+        'Quantidade': [2] * n,
+    }).to_excel(caminho, index=False)
+
+
+def test_cache_reaproveita_catalogo_e_invalida():
+    with tempfile.TemporaryDirectory() as pasta:
+        planilha = os.path.join(pasta, 'compras.xlsx')
+        _criar_planilha(planilha, 5)
+
+        analise = AnaliseFinanceira()
+        analise.ativar_cache(os.path.join(pasta, 'cache'))
+        original = analise.carregar_produtos_excel(planilha)
+        assert len(os.listdir(analise.cache.diretorio)) == 1
+
+        do_cache = analise.carregar_produtos_excel(planilha)
+        pd.testing.assert_frame_equal(original, do_cache)
+
+        analise.invalidar_cache(planilha)
+        assert os.listdir(analise.cache.diretorio) == []
+
+
+def test_cache_remove_entradas_menos_usadas():
+    with tempfile.TemporaryDirectory() as pasta:
+        analise = AnaliseFinanceira()
+        analise.ativar_cache(os.path.join(pasta, 'cache'), limite_bytes=1)
+        for i in range(3):
+            planilha = os.path.join(pasta, f'compras_{i}.xlsx')
+            _criar_planilha(planilha, i + 1)
+            analise.carregar_produtos_excel(planilha)
+
+        # Com um limite minúsculo, nenhuma entrada antiga sobrevive
+        assert len(os.listdir(analise.cache.diretorio)) <= 1
+
+
+def test_entrada_removida_durante_a_leitura_vira_cache_miss(monkeypatch):
+    with tempfile.TemporaryDirectory() as pasta:
+        planilha = os.path.join(pasta, 'compras.xlsx')
+        _criar_planilha(planilha, 3)
+        analise = AnaliseFinanceira()
+        analise.ativar_cache(os.path.join(pasta, 'cache'))
+        analise.carregar_produtos_excel(planilha)
+
+        # Simula outra thread aplicando o limite logo depois da checagem de existência
+        utime = os.utime
+        def utime_e_remove(caminho, *args, **kwargs):
+            utime(caminho, *args, **kwargs)
+            os.remove(caminho)
+        monkeypatch.setattr(os, 'utime', utime_e_remove)
+        chave = analise.cache.chave(open(planilha, 'rb').read())
+        assert analise.cache.obter(chave) is None
+
+        monkeypatch.setattr(os, 'utime', utime)
+        assert len(analise.carregar_produtos_excel(planilha)) == 3
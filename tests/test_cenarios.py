@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analise_financeira import AnaliseFinanceira, ConfiguracaoPreco
+
+
+@pytest.fixture
+def analise():
+    analise = AnaliseFinanceira()
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja'],
+        'Custo_Compra': [15.50, 8.90, 12.30],
+        'Quantidade': [10, 15, 8],
+    })
+    return analise
+
+
+def test_cubo_de_cenarios_igual_ao_calculo_individual(analise):
+    margens = [0.1, 0.25, 0.4]
+    custos = [1000.0, 2750.0]
+
+    # Bloco pequeno força várias iterações sobre os cenários
+    cubo = analise.simular_cenarios(margens, custos, max_elementos_bloco=4)
+    assert cubo['preco'].shape == (3, 2, 1, 3)
+
+    for i, margem in enumerate(margens):
+        for j, custo in enumerate(custos):
+            df = analise.calcular_preco_lote(ConfiguracaoPreco.criar({'total': custo}, margem))
+            np.testing.assert_allclose(cubo['preco'][i, j, 0], df['preco_venda_unitario'])
+            np.testing.assert_allclose(cubo['lucro'][i, j, 0], df['lucro_total'])
+            np.testing.assert_allclose(cubo['receita_total'][i, j, 0], df['preco_venda_total'].sum())
+            np.testing.assert_allclose(cubo['lucro_total'][i, j, 0], df['lucro_total'].sum())
+
+
+def test_cenarios_com_volume_esperado(analise):
+    cubo = analise.simular_cenarios(0.2, 3000.0, volumes=[100, 0], por_produto=False)
+
+    assert 'preco' not in cubo
+    custo_compra_total = (analise.produtos['Custo_Compra'] * analise.produtos['Quantidade']).sum()
+    # Volume zero: nenhum custo fixo rateado
+    np.testing.assert_allclose(cubo['receita_total'][0, 0, 1], custo_compra_total / 0.8)
+    esperado = (custo_compra_total + (3000.0 / 30 / 100) * 33) / 0.8
+    np.testing.assert_allclose(cubo['receita_total'][0, 0, 0], esperado)
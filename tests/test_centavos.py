@@ -0,0 +1,106 @@
+import io
+import numpy as np
+import pytest
+import pandas as pd
+
+from analise_financeira import AnaliseFinanceira, dividir_arredondando, para_centavos
+
+
+@pytest.fixture
+def analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0})
+    analise.definir_margem_lucro(0.3)
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Arroz 5kg', 'Leite 1L'],
+        'Custo_Compra': [15.50, 8.90, 4.505, 4.50],
+        'Quantidade': [10.0, 15.0, 8.0, 30.0],
+    })
+    return analise
+
+
+def test_arredondamento_meio_para_cima():
+    np.testing.assert_array_equal(para_centavos([4.505, 0.125, 1.0, 2.344]), [451, 13, 100, 234])
+    assert dividir_arredondando(5, 2) == 3
+    assert dividir_arredondando(4, 3) == 1
+    assert dividir_arredondando(5, 3) == 2
+
+
+def test_compactar_produtos_usa_tipos_enxutos(analise):
+    compacto = analise.compactar_produtos()
+
+    assert compacto['Nome_Produto'].dtype == 'category'
+    assert compacto['Custo_Compra_Centavos'].dtype == np.int64
+    assert compacto['Quantidade'].dtype == np.int32
+    assert list(compacto['Custo_Compra_Centavos']) == [1550, 890, 451, 450]
+
+
+def test_preco_em_centavos_exato_e_proximo_do_float(analise):
+    centavos = analise.calcular_preco_lote_centavos()
+    reais = analise.calcular_preco_lote()
+
+    assert centavos['preco_venda_unitario'].dtype == np.int32
+    assert centavos['preco_venda_total'].dtype == np.int64
+    # custo fixo: 240000 centavos / 30 = 8000 por dia; 8000 / 63 itens = 126,98 -> 127
+    assert (centavos['custo_fixo_alocado_unitario'] == 127).all()
+    assert centavos.loc[0, 'preco_venda_unitario'] == dividir_arredondando((1550 + 127) * 10000, 7000)
+    np.testing.assert_allclose(centavos['preco_venda_unitario'] / 100, reais['preco_venda_unitario'], atol=0.015)
+
+    relatorio = analise.gerar_relatorio(centavos)
+    assert relatorio['receita_total_estimada'] == int(centavos['preco_venda_total'].sum()) / 100
+    assert relatorio['lucro_total_estimado'] == round(relatorio['lucro_total_estimado'], 2)
+
+    convertido = analise.centavos_para_reais(centavos)
+    assert convertido.loc[0, 'Custo_Compra_Unitario'] == 15.5
+
+
+def test_modo_compacto_sem_estouro_e_sem_arredondar_quantidades():
+    analise = AnaliseFinanceira()
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Parafuso', 'Arruela'],
+        'Custo_Compra': [0.05, 0.02],
+        'Quantidade': [2_000_000_000, 2_000_000_000],
+    })
+    relatorio = analise.gerar_relatorio(analise.calcular_preco_lote_centavos())
+    assert relatorio['total_itens_comprados'] == 4_000_000_000
+
+    # Produtos pesados (quantidade fracionária) não são arredondados em silêncio
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Queijo', 'Leite 1L', 'Presunto'],
+        'Custo_Compra': [42.0, 4.5, 30.0],
+        'Quantidade': [0.4, 12, 1.5],
+    })
+    with pytest.raises(ValueError, match='linha 0: 0.4'):
+        analise.compactar_produtos()
+
+
+def test_carga_compacta_funciona_com_as_apis_em_reais():
+    planilha = io.BytesIO()
+    pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'arroz 5 kg', 'Leite 1L'],
+        'Custo_Compra': ['15,50', 8.90, 16.10, 4.50],
+        'Quantidade': [10, 15, 5, 30],
+        'Preco_Maximo': [None, 14.0, None, 7.0],
+    }).to_excel(planilha, index=False)
+
+    completa, compacta = AnaliseFinanceira(), AnaliseFinanceira()
+    for analise, compacto in ((completa, False), (compacta, True)):
+        analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0})
+        analise.definir_margem_lucro(0.3)
+        planilha.seek(0)
+        analise.carregar_produtos_excel(planilha, compacto=compacto)
+
+    assert 'Custo_Compra' not in compacta.produtos.columns
+    assert compacta.produtos['Custo_Compra_Centavos'].dtype == np.int64
+    assert isinstance(compacta.produtos['Nome_Produto'].dtype, pd.CategoricalDtype)
+
+    pd.testing.assert_frame_equal(compacta.calcular_preco_lote(), completa.calcular_preco_lote(),
+                                  check_dtype=False, check_categorical=False)
+    np.testing.assert_allclose(compacta.simular_cenarios([0.2, 0.4], [3000.0], por_produto=False)['lucro_total'],
+                               completa.simular_cenarios([0.2, 0.4], [3000.0], por_produto=False)['lucro_total'])
+    assert np.isclose(compacta.margem_para_lucro(500.0), completa.margem_para_lucro(500.0))
+
+    consolidado, _ = compacta.consolidar_produtos()
+    assert list(consolidado['Quantidade']) == [15, 15, 30]
+    assert consolidado['Custo_Compra_Centavos'].iloc[0] == 1570
+    assert compacta.calcular_preco_lote_centavos()['Quantidade'].sum() == 60
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from analise_financeira import AnaliseFinanceira, COLUNAS_CONSOLIDACAO, normalizar_nomes
+
+
+def test_normalizar_nomes_ignora_caixa_acentos_espacos_e_unidades():
+    nomes = pd.Series(['Leite Integral 1L', ' leite  integral 1 l', 'LEITE INTEGRAL 1 litro',
+                       'Açúcar 1,5kg', 'acucar 1.5 KG', 'Óleo de Soja 900 ml', 'oleo de soja 900ML',
+                       'Ovos 12 unidades', 'ovos 12un', 'Arroz 5kg', 'Arroz 1kg',
+                       'Farinha 1.000g', 'farinha 1000 g', 'Farinha 1g', 'Sabão 1.000,5 ml'])
+    chaves = normalizar_nomes(nomes).tolist()
+
+    assert len(set(chaves[0:3])) == 1
+    assert chaves[3] == chaves[4] == 'acucar 1.5kg'
+    assert chaves[5] == chaves[6] == 'oleo de soja 900ml'
+    assert chaves[7] == chaves[8]
+    assert chaves[9] != chaves[10]
+    # "1.000" antes da unidade é mil, não 1,0
+    assert chaves[11] == chaves[12] == 'farinha 1000g'
+    assert chaves[11] != chaves[13]
+    assert chaves[14] == 'sabao 1000.5ml'
+
+
+def test_consolidacao_com_custo_medio_ponderado(tmp_path):
+    arquivo = tmp_path / 'compras.xlsx'
+    pd.DataFrame({
+        'Nome_Produto': ['Leite 1L', 'Arroz 5kg', 'LEITE 1 l', 'Feijão 1kg', 'leite 1 litro'],
+        'Custo_Compra': [4.00, 15.50, 5.00, 8.90, 4.50],
+        'Quantidade': [10, 4, 30, 6, 0],
+        'Fornecedor': ['A', 'A', 'B', 'B', 'C'],
+    }).to_excel(arquivo, index=False)
+
+    analise = AnaliseFinanceira()
+    produtos = analise.carregar_produtos_excel(str(arquivo), consolidar=True)
+
+    assert produtos['Nome_Produto'].tolist() == ['Leite 1L', 'Arroz 5kg', 'Feijão 1kg']
+    assert np.allclose(produtos['Quantidade'], [40, 4, 6])
+    assert np.isclose(produtos.loc[0, 'Custo_Compra'], (4.00 * 10 + 5.00 * 30) / 40)
+    assert produtos['Linhas_Origem'].tolist() == [3, 1, 1]
+    assert produtos.loc[0, 'Fornecedor'] == 'A'
+
+    mapa = analise.mapa_consolidacao
+    assert list(mapa.columns) == COLUNAS_CONSOLIDACAO
+    assert mapa['linha'].tolist() == [0, 1, 2, 3, 4]
+    assert mapa['produto'].tolist() == [0, 1, 0, 2, 0]
+    assert mapa.loc[4, 'Custo_Compra'] == 4.50
+
+    # Uma única precificação por produto: a prateleira não tem preços conflitantes
+    df = analise.calcular_preco_lote()
+    assert len(df) == 3 and df['Nome_Produto'].is_unique
+
+    # Sem consolidar, as linhas continuam separadas e não há mapa
+    assert len(analise.carregar_produtos_excel(str(arquivo))) == 5
+    assert analise.mapa_consolidacao is None
+
+
+def test_custo_medio_simples_sem_itens_e_cache_de_chaves():
+    analise = AnaliseFinanceira()
+    produtos = pd.DataFrame({
+        'Nome_Produto': ['Sal 1kg', 'sal 1 kg'],
+        'Custo_Compra': [2.00, 3.00],
+        'Quantidade': [0.0, 0.0],
+    })
+    consolidado, _ = analise.consolidar_produtos(produtos)
+    assert len(consolidado) == 1 and np.isclose(consolidado.loc[0, 'Custo_Compra'], 2.50)
+    assert analise._chaves_nomes == {'Sal 1kg': 'sal 1kg', 'sal 1 kg': 'sal 1kg'}
+
+
+def test_consolidacao_em_varias_threads_com_cache_pequeno(monkeypatch):
+    import analise_financeira
+    from concurrent.futures import ThreadPoolExecutor
+    # Cache minúsculo: as threads esvaziam o cache umas das outras o tempo todo
+    monkeypatch.setattr(analise_financeira, 'LIMITE_CACHE_NOMES', 3)
+    analise = AnaliseFinanceira()
+
+    def consolidar(i):
+        produtos = pd.DataFrame({
+            'Nome_Produto': [f'Item {i} 1L', f'item {i} 1 l', f'Outro {i}', f'OUTRO {i}'],
+            'Custo_Compra': [1.0, 3.0, 2.0, 2.0],
+            'Quantidade': [1.0, 1.0, 1.0, 1.0],
+        })
+        return [len(analise.consolidar_produtos(produtos)[0]) for _ in range(20)]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultados = list(executor.map(consolidar, range(16)))
+    assert all(tamanho == 2 for tamanhos in resultados for tamanho in tamanhos)
@@ -0,0 +1,76 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from analise_financeira import AnaliseFinanceira, ESCADA_PADRAO
+
+
+@pytest.fixture
+def analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0})
+    analise.definir_margem_lucro(0.3)
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja', 'Leite 1L', 'Cesta Básica', 'Freezer'],
+        'Custo_Compra': [15.50, 8.90, 12.30, 4.50, 95.00, 1890.00],
+        'Quantidade': [10, 15, 8, 30, 2, 1],
+    })
+    return analise
+
+
+def test_precos_vao_para_o_degrau_mais_proximo_acima():
+    analise = AnaliseFinanceira()
+    df = pd.DataFrame({
+        'Nome_Produto': list('abcdefg'),
+        'Quantidade': [1, 2, 1, 1, 1, 1, 3],
+        'custo_total_unitario': [1.0] * 7,
+        'preco_venda_unitario': [7.3467, 7.49, 7.50, 9.995, 57.10, 150.20, 1234.5],
+    })
+    arredondado = analise.aplicar_escada_precos(df)
+
+    assert np.allclose(arredondado['preco_venda_unitario'], [7.49, 7.49, 7.99, 10.99, 57.99, 151.0, 1240.0])
+    assert np.allclose(arredondado['lucro_unitario'], arredondado['preco_venda_unitario'] - 1.0)
+    assert np.allclose(arredondado['preco_venda_total'], arredondado['preco_venda_unitario'] * df['Quantidade'])
+    assert np.allclose(arredondado['preco_sem_arredondamento'], df['preco_venda_unitario'])
+
+    # Reaplicar com outra escada parte do preço calculado, não do já arredondado
+    inteiros = analise.aplicar_escada_precos(arredondado, escada=((0.0, 1.0, (0.0,)),))
+    assert np.allclose(inteiros['preco_venda_unitario'], [8, 8, 8, 10, 58, 151, 1235])
+
+    with pytest.raises(ValueError):
+        analise.aplicar_escada_precos(df, escada=((10.0, 1.0, (0.99,)), (5.0, 1.0, (0.49,))))
+    with pytest.raises(ValueError):
+        analise.aplicar_escada_precos(df, escada=((0.0, 1.0, (1.49,)),))
+
+
+def test_margem_efetiva_no_relatorio(analise):
+    df = analise.calcular_preco_lote()
+    arredondado = analise.aplicar_escada_precos(df)
+
+    assert (arredondado['preco_venda_unitario'] >= df['preco_venda_unitario']).all()
+    relatorio = analise.gerar_relatorio(arredondado)
+    receita = arredondado['preco_venda_total'].sum()
+    assert np.isclose(relatorio['receita_total_estimada'], receita)
+    assert np.isclose(relatorio['receita_sem_arredondamento'], df['preco_venda_total'].sum())
+    assert np.isclose(relatorio['margem_lucro_sem_arredondamento'], 30.0)
+    assert np.isclose(relatorio['margem_lucro_media'], arredondado['lucro_total'].sum() / receita * 100)
+    assert relatorio['margem_lucro_media'] > 30.0
+    assert 'receita_sem_arredondamento' not in analise.gerar_relatorio(df)
+
+    buffer = io.BytesIO()
+    analise.exportar_resultados(arredondado, buffer)
+    resumo = load_workbook(io.BytesIO(buffer.getvalue()))['Resumo_Financeiro']
+    assert 'Margem antes do arredondamento' in [linha[0] for linha in resumo.iter_rows(values_only=True)]
+
+
+def test_escada_no_modo_centavos(analise):
+    df_reais = analise.aplicar_escada_precos(analise.calcular_preco_lote())
+    df_centavos = analise.aplicar_escada_precos(analise.calcular_preco_lote_centavos(), ESCADA_PADRAO)
+
+    assert df_centavos.attrs['unidade_monetaria'] == 'centavos'
+    convertido = analise.centavos_para_reais(df_centavos)
+    assert np.allclose(convertido['preco_venda_unitario'], df_reais['preco_venda_unitario'])
+    relatorio = analise.gerar_relatorio(df_centavos)
+    assert np.isclose(relatorio['receita_total_estimada'], df_reais['preco_venda_total'].sum())
@@ -1,11 +1,9 @@
+import io
 import tempfile
 import os
-import sys
 import pandas as pd
 from openpyxl import load_workbook
 
-# Garantir que o diretório do projeto esteja no path para importar o módulo
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from analise_financeira import AnaliseFinanceira
 
 
@@ -51,3 +49,83 @@ def test_export_no_duplicated_header():
             os.remove(caminho)
         except Exception:
             pass
+
+
+def test_export_streaming_mantem_planilhas_e_dados():
+    analise = AnaliseFinanceira()
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': [f'Produto {i}' for i in range(50)],
+        'Custo_Compra': [1.0 + i for i in range(50)],
+        'Quantidade': [2] * 50,
+    })
+    df_result = analise.calcular_preco_lote()
+
+    tmp = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+    tmp.close()
+    caminho = tmp.name
+
+    try:
+        analise.exportar_resultados(df_result, caminho, streaming=True)
+
+        wb = load_workbook(caminho, read_only=True)
+        assert wb.sheetnames == ['Analise_Produtos', 'Resumo_Financeiro', 'Custos_Fixos']
+        ws = wb['Analise_Produtos']
+        linhas = list(ws.iter_rows(values_only=True))
+
+        assert linhas[0][0] == 'ANÁLISE FINANCEIRA DE PRODUTOS'
+        assert list(linhas[1][:len(df_result.columns)]) == list(df_result.columns)
+        assert len(linhas) == 2 + len(df_result)
+        assert linhas[2][0] == 'Produto 0'
+        assert linhas[-1][df_result.columns.get_loc('preco_venda_unitario')] == df_result['preco_venda_unitario'].iloc[-1]
+    finally:
+        try:
+            os.remove(caminho)
+        except Exception:
+            pass
+
+
+def test_export_em_memoria_devolve_bytes():
+    analise = AnaliseFinanceira()
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg'],
+        'Custo_Compra': [15.5, 8.9],
+        'Quantidade': [10, 15],
+    })
+    df_result = analise.calcular_preco_lote()
+
+    for streaming in (False, True):
+        buffer = io.BytesIO()
+        conteudo = analise.exportar_resultados(df_result, buffer, streaming=streaming)
+        assert conteudo == buffer.getvalue()
+
+        wb = load_workbook(io.BytesIO(conteudo), read_only=True)
+        assert wb.sheetnames == ['Analise_Produtos', 'Resumo_Financeiro', 'Custos_Fixos']
+
+    assert analise.exportar_resultados(df_result)[:2] == b'PK'
+
+
+def test_export_colunar_por_extensao_grava_as_tres_tabelas():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0})
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja'],
+        'Custo_Compra': [15.5, 8.9, 12.3],
+        'Quantidade': [10, 15, 8],
+    })
+    df_result = analise.calcular_preco_lote()
+
+    leitores = {'.parquet': pd.read_parquet, '.feather': pd.read_feather, '.csv.gz': pd.read_csv}
+    with tempfile.TemporaryDirectory() as pasta:
+        for extensao, ler in leitores.items():
+            analise.exportar_resultados(df_result, os.path.join(pasta, f'relatorio{extensao}'))
+
+            produtos = ler(os.path.join(pasta, f'relatorio{extensao}'))
+            pd.testing.assert_series_equal(produtos['preco_venda_unitario'], df_result['preco_venda_unitario'])
+            resumo = ler(os.path.join(pasta, f'relatorio_resumo{extensao}'))
+            assert resumo.loc[0, 'total_itens_comprados'] == 33
+            custos = ler(os.path.join(pasta, f'relatorio_custos_fixos{extensao}'))
+            assert custos.set_index('Custo').loc['aluguel', 'Valor Mensal'] == 900.0
+
+    # Formato explícito em um destino em memória: só a tabela de produtos
+    conteudo = analise.exportar_resultados(df_result, io.BytesIO(), formato='parquet')
+    assert len(pd.read_parquet(io.BytesIO(conteudo))) == 3
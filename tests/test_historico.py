@@ -0,0 +1,37 @@
+import os
+import tempfile
+from datetime import datetime
+
+from analise_financeira import AnaliseFinanceira
+from historico_precos import HistoricoPrecos
+
+
+def test_historico_registra_e_consulta_precos():
+    with tempfile.TemporaryDirectory() as pasta:
+        historico = HistoricoPrecos(os.path.join(pasta, 'historico.db'))
+        analise = AnaliseFinanceira()
+        analise.produtos = analise.gerar_catalogo_sintetico(100)
+        analise.definir_custos_fixos({'aluguel': 900.0})
+
+        analise.definir_margem_lucro(0.25)
+        df_mes_passado = analise.calcular_preco_lote()
+        anterior = historico.registrar_execucao(df_mes_passado, analise.configuracao(), datetime(2026, 9, 1))
+
+        analise.definir_margem_lucro(0.35)
+        df_semana = analise.calcular_preco_lote()
+        atual = historico.registrar_execucao(df_semana, analise.configuracao(), datetime(2026, 10, 10))
+
+        execucoes = historico.listar_execucoes()
+        assert list(execucoes['id']) == [atual, anterior]
+        assert list(execucoes['total_produtos']) == [100, 100]
+
+        nome = df_semana.loc[0, 'Nome_Produto']
+        serie = historico.historico_produto(nome)
+        assert list(serie['preco_venda_unitario']) == [df_mes_passado.loc[0, 'preco_venda_unitario'],
+                                                       df_semana.loc[0, 'preco_venda_unitario']]
+        assert len(historico.historico_produto(nome, inicio=datetime(2026, 10, 1))) == 1
+        assert nome in historico.buscar_produtos(nome[:6], limite=100)
+
+        comparacao = historico.comparar_execucoes(anterior, atual)
+        assert len(comparacao) == 100
+        assert (comparacao['variacao'] > 0).all()
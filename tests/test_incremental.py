@@ -0,0 +1,75 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from analise_financeira import AnaliseFinanceira
+
+
+def _razao(inicio, fim):
+    return pd.DataFrame({
+        'Nome_Produto': [f'Produto {i}' for i in range(inicio, fim)],
+        'Custo_Compra': [1.5 + i for i in range(inicio, fim)],
+        'Quantidade': [2 + i % 3 for i in range(inicio, fim)],
+    })
+
+
+def _salvar(df, caminho):
+    if caminho.endswith('.csv'):
+        df.to_csv(caminho, index=False)
+    else:
+        df.to_excel(caminho, index=False)
+
+
+def _analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0})
+    return analise
+
+
+def test_carga_incremental_le_so_a_cauda_e_reprecifica():
+    for extensao in ('.xlsx', '.csv'):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, f'razao{extensao}')
+            _salvar(_razao(0, 6), caminho)
+
+            analise = _analise()
+            assert len(analise.carregar_incremental(caminho)) == 6
+            analise.calcular_preco_lote()
+
+            validados = []
+            validar = analise.validar_produtos
+            analise.validar_produtos = lambda df: validados.append(len(df)) or validar(df)
+
+            _salvar(_razao(0, 9), caminho)
+            novos = analise.carregar_incremental(caminho)
+            assert list(novos['Nome_Produto']) == ['Produto 6', 'Produto 7', 'Produto 8']
+            assert validados == [3]
+
+            # O lote acumulado é igual ao de uma carga completa do arquivo final
+            completo = _analise()
+            completo.carregar_varios_arquivos([caminho])
+            esperado = completo.calcular_preco_lote()
+            assert list(analise.produtos.index) == list(range(9))
+            for coluna in ('custo_fixo_alocado_unitario', 'preco_venda_unitario', 'lucro_total'):
+                np.testing.assert_allclose(analise.resultados[coluna], esperado[coluna])
+
+            # Recarregar sem mudanças não traz nada novo
+            assert analise.carregar_incremental(caminho).empty
+            assert len(analise.resultados) == 9
+
+
+def test_carga_incremental_recarrega_quando_linhas_antigas_mudam():
+    for extensao in ('.xlsx', '.csv'):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, f'razao{extensao}')
+            _salvar(_razao(0, 4), caminho)
+            analise = _analise()
+            analise.carregar_incremental(caminho)
+
+            alterado = _razao(0, 5)
+            alterado.loc[1, 'Custo_Compra'] = 99.0
+            _salvar(alterado, caminho)
+            recarregados = analise.carregar_incremental(caminho)
+            assert len(recarregados) == 5
+            assert analise.produtos.loc[1, 'Custo_Compra'] == 99.0
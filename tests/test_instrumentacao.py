@@ -0,0 +1,73 @@
+import io
+import logging
+import threading
+import tracemalloc
+
+from analise_financeira import AnaliseFinanceira, Instrumentacao
+
+
+def test_instrumentacao_registra_etapas(caplog):
+    analise = AnaliseFinanceira()
+    instrumentacao = analise.ativar_instrumentacao(medir_memoria=True)
+    recebidos = []
+    instrumentacao.adicionar_gancho(recebidos.append)
+
+    planilha = io.BytesIO()
+    analise.gerar_catalogo_sintetico(200).to_excel(planilha, index=False)
+    planilha.seek(0)
+
+    with caplog.at_level(logging.INFO, logger='analise_financeira'):
+        analise.carregar_produtos_excel(planilha)
+        df = analise.calcular_preco_lote()
+        analise.exportar_resultados(df, io.BytesIO())
+
+    etapas = [registro['etapa'] for registro in instrumentacao.registros]
+    # O relatório roda dentro da exportação, por isso termina antes dela
+    assert etapas == ['carregar', 'precificar', 'relatorio', 'exportar']
+    assert recebidos == instrumentacao.registros
+    for registro in instrumentacao.registros:
+        assert registro['linhas'] == 200
+        assert registro['segundos'] >= 0
+        assert registro['pico_memoria_bytes'] >= 0
+
+    exportar = instrumentacao.registros[-1]
+    relatorio = instrumentacao.registros[-2]
+    assert exportar['pico_memoria_bytes'] >= relatorio['pico_memoria_bytes']
+    assert [r.metricas['etapa'] for r in caplog.records] == etapas
+
+
+def test_sem_instrumentacao_nada_e_registrado():
+    analise = AnaliseFinanceira()
+    analise.produtos = analise.gerar_catalogo_sintetico(10)
+    analise.calcular_preco_lote()
+    assert analise.instrumentacao is None
+
+
+def test_medicao_de_memoria_concorrente_entre_instancias():
+    # A etapa curta liga o rastreamento e termina no meio da longa: não pode desligá-lo
+    # nem perder o pico que a longa atingiu antes de o bloco ser liberado
+    longa, curta = Instrumentacao(medir_memoria=True), Instrumentacao(medir_memoria=True)
+    curta_iniciou, longa_alocou, curta_terminou = threading.Event(), threading.Event(), threading.Event()
+
+    def etapa_curta():
+        with curta.etapa('curta'):
+            curta_iniciou.set()
+            longa_alocou.wait(5)
+        curta_terminou.set()
+
+    def etapa_longa():
+        curta_iniciou.wait(5)
+        with longa.etapa('longa'):
+            bloco = bytearray(20 * 2**20)
+            del bloco
+            longa_alocou.set()
+            curta_terminou.wait(5)
+
+    threads = [threading.Thread(target=etapa_curta), threading.Thread(target=etapa_longa)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert longa.registros[0]['pico_memoria_bytes'] >= 20 * 2**20
+    assert not tracemalloc.is_tracing()
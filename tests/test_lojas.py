@@ -0,0 +1,35 @@
+import json
+import os
+import tempfile
+import pandas as pd
+
+from precificacao_lojas import lojas_do_diretorio, processar_lojas
+
+
+def test_processa_lojas_em_paralelo_e_consolida():
+    with tempfile.TemporaryDirectory() as pasta:
+        entrada = os.path.join(pasta, 'lojas')
+        saida = os.path.join(pasta, 'relatorios')
+        os.makedirs(entrada)
+        for i, loja in enumerate(['centro', 'bairro']):
+            pd.DataFrame({
+                'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg'],
+                'Custo_Compra': [15.5 + i, 8.9],
+                'Quantidade': [10, 15],
+            }).to_excel(os.path.join(entrada, f'{loja}.xlsx'), index=False)
+        with open(os.path.join(entrada, 'centro.json'), 'w', encoding='utf-8') as f:
+            json.dump({'custos_fixos': {'aluguel': 3000.0}, 'margem': 0.4}, f)
+        # Planilha sem as colunas obrigatórias: erro registrado, as outras seguem
+        pd.DataFrame({'x': [1]}).to_excel(os.path.join(entrada, 'quebrada.xlsx'), index=False)
+
+        lojas = lojas_do_diretorio(entrada)
+        resumo = processar_lojas(lojas, saida, max_processos=2)
+
+        assert list(resumo['loja']) == ['bairro', 'centro', 'quebrada']
+        assert resumo.loc[2, 'erro'] is not None
+        assert resumo.loc[:1, 'erro'].isna().all()
+        assert os.path.exists(os.path.join(saida, 'relatorio_centro.xlsx'))
+        assert os.path.exists(os.path.join(saida, 'resumo_lojas.xlsx'))
+        # Loja centro tem custo fixo e margem próprios
+        assert resumo.loc[1, 'custo_fixo_total'] > 0
+        assert resumo.loc[0, 'custo_fixo_total'] == 0
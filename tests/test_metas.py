@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analise_financeira import AnaliseFinanceira, ConfiguracaoPreco
+
+CUSTOS_FIXOS = {'aluguel': 900.0, 'salario': 1500.0}
+
+
+@pytest.fixture
+def analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos(CUSTOS_FIXOS)
+    analise.definir_margem_lucro(0.3)
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja', 'Leite 1L'],
+        'Custo_Compra': [15.50, 8.90, 12.30, 4.50],
+        'Quantidade': [10, 15, 8, 30],
+    })
+    return analise
+
+
+def test_margem_em_forma_fechada_reproduz_lucro_alvo(analise):
+    margem = analise.margem_para_lucro(200.0)
+    df = analise.calcular_preco_lote(ConfiguracaoPreco.criar(CUSTOS_FIXOS, margem))
+    assert np.isclose(df['lucro_total'].sum(), 200.0)
+
+    # Várias metas de uma vez: meta não positiva não pede margem, meta impossível dá NaN
+    margens = analise.margem_para_lucro(np.array([-10.0, 0.0, 200.0, 1e9]))
+    assert margens.shape == (4,)
+    assert margens[0] == 0.0 and margens[1] == 0.0
+    assert np.isclose(margens[2], margem)
+    assert np.isnan(margens[3])
+
+
+def test_tetos_de_preco_exigem_margem_maior(analise):
+    sem_teto = analise.margem_para_lucro(200.0)
+    tetos = {'Leite 1L': 5.20, 'Arroz 5kg': 19.90}
+    margem = analise.margem_para_lucro(200.0, precos_maximos=tetos)
+    assert margem > sem_teto
+
+    precos = analise.precos_equilibrio(tetos, margem=margem)
+    assert np.isclose((precos['lucro_unitario'] * precos['Quantidade']).sum(), 200.0, atol=1e-5)
+    assert (precos['preco_venda_unitario'] <= precos['preco_maximo'].fillna(np.inf)).all()
+
+    # Só os produtos sem teto podem crescer: acima do lucro máximo, a meta é inatingível
+    assert np.isnan(analise.margem_para_lucro(1e9, precos_maximos=[1.0, 1.0, 1.0, 1.0]))
+
+
+def test_precos_equilibrio_por_produto(analise):
+    analise.produtos['Preco_Maximo'] = ['', '12,00', '', '4,00']
+    df = analise.calcular_preco_lote()
+    precos = analise.precos_equilibrio()
+
+    assert np.allclose(precos['preco_equilibrio'], df['custo_total_unitario'])
+    assert precos['viavel'].tolist() == [True, True, True, False]
+    assert np.isnan(precos.loc[0, 'margem_maxima'])
+    assert np.isclose(precos.loc[1, 'margem_maxima'], 1 - df.loc[1, 'custo_total_unitario'] / 12.0)
+    assert np.isclose(precos.loc[0, 'preco_venda_unitario'], df.loc[0, 'preco_venda_unitario'])
+    assert precos.loc[3, 'lucro_unitario'] < 0
+
+    with pytest.raises(ValueError):
+        analise.precos_equilibrio([1.0, 2.0])
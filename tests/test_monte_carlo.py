@@ -0,0 +1,77 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from analise_financeira import AnaliseFinanceira
+
+
+@pytest.fixture
+def analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0})
+    analise.definir_margem_lucro(0.3)
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja', 'Leite 1L'],
+        'Custo_Compra': [15.50, 8.90, 12.30, 4.50],
+        'Quantidade': [10, 15, 8, 30],
+        'Categoria': ['Grãos', 'Grãos', 'Mercearia', 'Laticínios'],
+    })
+    return analise
+
+
+def test_venda_total_reproduz_lucro_do_lote(analise):
+    df = analise.calcular_preco_lote()
+    simulacao = analise.simular_monte_carlo((1.0, 1.0, 1.0), n_simulacoes=1000, df_resultados=df)
+
+    assert np.isclose(simulacao['lucro_sem_sobras'], df['lucro_total'].sum())
+    assert np.allclose(simulacao['lucros'], simulacao['lucro_sem_sobras'])
+    assert simulacao['probabilidade_prejuizo'] == 0.0
+
+
+def test_percentis_ordenados_e_probabilidade_de_prejuizo(analise):
+    simulacao = analise.simular_monte_carlo((0.2, 0.6, 1.0), n_simulacoes=20_000)
+
+    valores = [simulacao['percentis'][p] for p in (5, 25, 50, 75, 95)]
+    assert valores == sorted(valores)
+    assert 0.0 < simulacao['probabilidade_prejuizo'] < 1.0
+    assert simulacao['lucros'].max() <= simulacao['lucro_sem_sobras'] + 1e-6
+    assert len(simulacao['lucros']) == 20_000
+
+
+def test_distribuicao_por_categoria(analise):
+    # Só Laticínios tem incerteza: o restante vende tudo
+    simulacao = analise.simular_monte_carlo((1.0, 1.0, 1.0), {'Laticínios': (0.0, 0.5, 1.0)},
+                                            agrupar_por='Categoria', n_simulacoes=5000)
+    df = analise.calcular_preco_lote()
+    receita_leite = df.loc[df['Categoria'] == 'Laticínios', 'preco_venda_total'].sum()
+    assert simulacao['lucros'].min() >= simulacao['lucro_sem_sobras'] - receita_leite - 1e-6
+    assert simulacao['lucros'].std() > 0
+
+    with pytest.raises(ValueError):
+        analise.simular_monte_carlo((0.9, 0.5, 1.0), n_simulacoes=10)
+
+
+def test_resultado_deterministico_com_e_sem_processos(analise):
+    df = analise.calcular_preco_lote()
+    sequencial = analise.simular_monte_carlo(n_simulacoes=25_000, semente=7, df_resultados=df)
+    repetido = analise.simular_monte_carlo(n_simulacoes=25_000, semente=7, df_resultados=df)
+    paralelo = analise.simular_monte_carlo(n_simulacoes=25_000, semente=7, df_resultados=df,
+                                           usar_processos=True, max_processos=2)
+
+    assert np.array_equal(sequencial['lucros'], repetido['lucros'])
+    assert np.array_equal(sequencial['lucros'], paralelo['lucros'])
+
+
+def test_exportacao_inclui_planilha_da_simulacao(analise):
+    df = analise.calcular_preco_lote()
+    simulacao = analise.simular_monte_carlo(n_simulacoes=1000, df_resultados=df)
+
+    for streaming in (False, True):
+        buffer = io.BytesIO()
+        analise.exportar_resultados(df, buffer, streaming=streaming, monte_carlo=simulacao)
+        planilha = load_workbook(io.BytesIO(buffer.getvalue()))['Simulacao_Monte_Carlo']
+        metricas = {linha[0]: linha[1] for linha in planilha.iter_rows(min_row=4, values_only=True)}
+        assert any(np.isclose(valor, simulacao['lucro_medio']) for valor in metricas.values()
+                   if isinstance(valor, float))
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from analise_financeira import AnaliseFinanceira
+
+
+def test_planilha_mista_converte_pacotes_para_unidades():
+    with tempfile.TemporaryDirectory() as pasta:
+        planilha = os.path.join(pasta, 'fornecedor.xlsx')
+        pd.DataFrame({
+            'Nome_Produto': ['Arroz 5kg', 'Leite 1L', 'Refrigerante', 'Biscoito'],
+            'Custo_Compra': [15.5, None, None, 2.0],
+            'Quantidade': [10, None, None, 30],
+            'Custo_Pacote': [None, 'R$ 54,00', 36.0, None],
+            'Unidades_Pacote': [None, 12, 6, None],
+            'Qtd_Pacotes': [None, 3, None, None],
+        }).to_excel(planilha, index=False)
+
+        analise = AnaliseFinanceira()
+        df = analise.carregar_produtos_excel(planilha)
+
+        np.testing.assert_allclose(df['Custo_Compra'], [15.5, 4.5, 6.0, 2.0])
+        np.testing.assert_allclose(df['Quantidade'], [10, 36, 6, 30])
+        # Qtd_Pacotes vazia conta como um pacote e fica registrada
+        assert list(analise.relatorio_validacao['coluna']) == ['Qtd_Pacotes']
+
+
+def test_planilha_so_de_pacotes_e_pacote_invalido():
+    analise = AnaliseFinanceira()
+    df, relatorio = analise.validar_produtos(pd.DataFrame({
+        'Nome_Produto': ['Café', 'Açúcar', 'Sal'],
+        'Custo_Pacote': [120.0, 50.0, 10.0],
+        'Unidades_Pacote': [10, 0, 'dez'],
+        'Qtd_Pacotes': [2, 1, 1],
+    }))
+
+    assert list(df['Nome_Produto']) == ['Café']
+    assert df['Custo_Compra'].iloc[0] == 12.0 and df['Quantidade'].iloc[0] == 20
+    invalidos = relatorio[relatorio['coluna'] == 'Unidades_Pacote']
+    assert list(invalidos['linha']) == [1, 2]
+    assert invalidos['motivo'].str.endswith('pacote ignorado').all()
+
+
+def test_streaming_aceita_planilha_por_pacote():
+    with tempfile.TemporaryDirectory() as pasta:
+        entrada = os.path.join(pasta, 'pacotes.csv')
+        pd.DataFrame({
+            'Nome_Produto': ['Café', 'Chá'],
+            'Custo_Pacote': [120.0, 30.0],
+            'Unidades_Pacote': [10, 5],
+            'Qtd_Pacotes': [2, 4],
+        }).to_csv(entrada, index=False)
+
+        analise = AnaliseFinanceira()
+        relatorio = analise.precificar_arquivo_streaming(entrada, os.path.join(pasta, 'saida.csv'))
+        assert relatorio['total_itens_comprados'] == 40
+        assert np.isclose(relatorio['custo_total_compra'], 240.0 + 120.0)
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+
+from analise_financeira import AnaliseFinanceira, ConfiguracaoPreco
+
+
+@pytest.fixture
+def analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0, 'internet': 100.0})
+    analise.definir_margem_lucro(0.3)
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja', 'Leite 1L'],
+        'Custo_Compra': [15.50, 8.90, 12.30, 4.50],
+        'Quantidade': [10, 15, 8, 30],
+    })
+    return analise
+
+
+@pytest.mark.parametrize('margem', [0.3, 0.0, 0.6])
+def test_preco_lote_igual_ao_calculo_por_produto(analise, margem):
+    analise.definir_margem_lucro(margem)
+    df = analise.calcular_preco_lote()
+
+    custo_fixo_por_produto = (sum(analise.custos_fixos.values()) / 30) / analise.produtos['Quantidade'].sum()
+    for i, produto in analise.produtos.iterrows():
+        esperado = analise.calcular_preco_venda(produto['Custo_Compra'], custo_fixo_por_produto)
+        for coluna, valor in esperado.items():
+            assert df.loc[i, coluna] == valor
+        assert df.loc[i, 'preco_venda_total'] == esperado['preco_venda_unitario'] * produto['Quantidade']
+
+    assert list(df.columns) == [
+        'Nome_Produto', 'Custo_Compra_Unitario', 'Quantidade',
+        'custo_produto_unitario', 'custo_fixo_alocado_unitario', 'custo_total_unitario',
+        'preco_venda_unitario', 'lucro_unitario',
+        'preco_venda_total', 'lucro_total', 'custo_total_compra', 'custo_fixo_total', 'custo_total_geral'
+    ]
+
+
+def test_preco_venda_aceita_arrays(analise):
+    custos = np.array([10.0, 20.0])
+    info = analise.calcular_preco_venda(custos, 1.0)
+    np.testing.assert_allclose(info['preco_venda_unitario'], (custos + 1.0) / 0.7)
+
+
+def test_reprecificacao_incremental_igual_ao_recalculo(analise):
+    analise.calcular_preco_lote()
+
+    analise.definir_margem_lucro(0.45)
+    analise.definir_custos_fixos({'aluguel': 1800.0})
+    incremental = analise.resultados
+
+    recalculado = analise.calcular_preco_lote()
+    pd.testing.assert_frame_equal(incremental, recalculado)
+
+
+def test_trocar_produtos_descarta_resultados_do_lote_anterior(analise):
+    analise.calcular_preco_lote()
+
+    analise.produtos = pd.DataFrame({'Nome_Produto': ['Café 500g'], 'Custo_Compra': [18.0], 'Quantidade': [5]})
+    assert analise.resultados is None
+    analise.definir_margem_lucro(0.5)
+    assert analise.resultados is None
+    assert list(analise.calcular_preco_lote()['Nome_Produto']) == ['Café 500g']
+
+
+def test_configuracao_explicita_nao_altera_instancia(analise):
+    padrao = analise.calcular_preco_lote()
+
+    outra = ConfiguracaoPreco.criar({'aluguel': 3000.0}, 0.5)
+    df = analise.calcular_preco_lote(outra)
+
+    assert analise.margem_lucro_desejada == 0.3
+    pd.testing.assert_frame_equal(analise.resultados, padrao)
+    esperado = (df['custo_total_unitario'] / 0.5).to_numpy()
+    np.testing.assert_allclose(df['preco_venda_unitario'].to_numpy(), esperado)
+
+
+def test_precificacao_concorrente_com_configuracoes_diferentes(analise):
+    configuracoes = [ConfiguracaoPreco.criar({'aluguel': 100.0 * i}, i / 20) for i in range(1, 15)]
+    esperados = [analise.calcular_preco_lote(config) for config in configuracoes]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        obtidos = list(executor.map(analise.calcular_preco_lote, configuracoes))
+
+    for esperado, obtido in zip(esperados, obtidos):
+        pd.testing.assert_frame_equal(esperado, obtido)
+
+
+def test_catalogo_sintetico_deterministico():
+    analise = AnaliseFinanceira()
+    a = analise.gerar_catalogo_sintetico(1000, semente=7)
+    b = analise.gerar_catalogo_sintetico(1000, semente=7)
+
+    pd.testing.assert_frame_equal(a, b)
+    assert a['Nome_Produto'].is_unique
+    assert list(a.columns) == ['Nome_Produto', 'Custo_Compra', 'Quantidade']
@@ -0,0 +1,66 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from analise_financeira import AnaliseFinanceira
+
+
+@pytest.fixture
+def analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0})
+    analise.definir_margem_lucro(0.3)
+    analise.produtos = pd.DataFrame({
+        'Nome_Produto': ['Arroz 5kg', 'Feijão 1kg', 'Óleo de Soja', 'Leite 1L'],
+        'Custo_Compra': [15.50, 8.90, 12.30, 4.50],
+        'Quantidade': [10, 15, 8, 30],
+        'Categoria': ['Grãos', 'Grãos', 'Mercearia', 'Laticínios'],
+        'Fornecedor': ['A', 'B', 'A', 'B'],
+    })
+    return analise
+
+
+def test_relatorio_totais_medias_e_extremos(analise):
+    df = analise.calcular_preco_lote()
+    relatorio = analise.gerar_relatorio(df)
+
+    assert relatorio['total_itens_comprados'] == 63
+    assert np.isclose(relatorio['receita_total_estimada'], df['preco_venda_total'].sum())
+    assert np.isclose(relatorio['markup_medio'],
+                      df['lucro_total'].sum() / df['custo_total_geral'].sum() * 100)
+    assert np.isclose(relatorio['margem_lucro_media'],
+                      df['lucro_total'].sum() / df['preco_venda_total'].sum() * 100)
+    assert relatorio['produto_mais_caro_unitario'] == 'Arroz 5kg'
+    assert relatorio['produto_mais_barato_unitario'] == 'Leite 1L'
+    assert relatorio['produto_maior_quantidade'] == 'Leite 1L'
+
+
+def test_relatorio_agrupado_por_categoria_e_fornecedor(analise):
+    df = analise.calcular_preco_lote()
+    relatorio = analise.gerar_relatorio(df)
+
+    por_categoria = relatorio['agrupamentos']['Categoria'].set_index('Categoria')
+    graos = df[df['Categoria'] == 'Grãos']
+    assert por_categoria.loc['Grãos', 'produtos'] == 2
+    assert por_categoria.loc['Grãos', 'itens'] == 25
+    assert np.isclose(por_categoria.loc['Grãos', 'receita_total'], graos['preco_venda_total'].sum())
+    assert np.isclose(por_categoria['lucro_total'].sum(), relatorio['lucro_total_estimado'])
+    assert set(relatorio['agrupamentos']['Fornecedor']['Fornecedor']) == {'A', 'B'}
+
+    # O lote compacto (centavos, categorias) produz as mesmas quebras, a menos do arredondamento unitário
+    analise.produtos = analise.compactar_produtos()
+    relatorio_centavos = analise.gerar_relatorio(analise.calcular_preco_lote_centavos())
+    por_categoria_centavos = relatorio_centavos['agrupamentos']['Categoria'].set_index('Categoria')
+    assert np.allclose(por_categoria_centavos['receita_total'], por_categoria['receita_total'], atol=0.01 * 30)
+
+
+def test_exportar_com_agrupamentos_cria_planilhas_extras(analise):
+    df = analise.calcular_preco_lote()
+    for streaming in (False, True):
+        conteudo = analise.exportar_resultados(df, streaming=streaming, agrupamentos=True)
+        wb = load_workbook(io.BytesIO(conteudo))
+        assert 'Por_Categoria' in wb.sheetnames and 'Por_Fornecedor' in wb.sheetnames
+        linhas = list(wb['Por_Categoria'].iter_rows(min_row=4, values_only=True))
+        assert sorted(linha[0] for linha in linhas) == ['Grãos', 'Laticínios', 'Mercearia']
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import numpy as np
+
+from analise_financeira import AnaliseFinanceira, ConfiguracaoPreco
+from servico_precos import ServicoPrecos
+
+
+async def _requisitar(porta, metodo, caminho, dados=None):
+    reader, writer = await asyncio.open_connection('127.0.0.1', porta)
+    corpo = json.dumps(dados).encode() if dados is not None else b''
+    writer.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(corpo)}\r\n"
+                 f"Connection: close\r\n\r\n".encode() + corpo)
+    await writer.drain()
+    resposta = await reader.read()
+    writer.close()
+    cabecalho, _, corpo_resposta = resposta.partition(b'\r\n\r\n')
+    return int(cabecalho.split()[1]), json.loads(corpo_resposta)
+
+
+def test_servico_agrupa_requisicoes_concorrentes():
+    configuracao = ConfiguracaoPreco.criar({'aluguel': 900.0, 'salario': 1500.0}, 0.3)
+    analise = AnaliseFinanceira()
+    custo_fixo = analise._custo_fixo_por_produto(200, configuracao)
+
+    async def cenario():
+        servico = ServicoPrecos(configuracao, total_itens_lote=200, janela_ms=50)
+        porta = await servico.iniciar('127.0.0.1', 0)
+        try:
+            custos = [1.5 + i for i in range(10)]
+            respostas = await asyncio.gather(*[
+                _requisitar(porta, 'POST', '/preco', {'nome': f'Produto {i}', 'custo': custo})
+                for i, custo in enumerate(custos)
+            ])
+            lote = await _requisitar(porta, 'POST', '/precos', {'produtos': [{'custo': 10}, {'custo': 20}]})
+            erro = await _requisitar(porta, 'POST', '/preco', {'nome': 'Sem custo'})
+            inexistente = await _requisitar(porta, 'GET', '/nada')
+            metricas = await _requisitar(porta, 'GET', '/metricas')
+        finally:
+            await servico.parar()
+        return custos, respostas, lote, erro, inexistente, metricas
+
+    custos, respostas, lote, erro, inexistente, metricas = asyncio.run(cenario())
+
+    for i, (custo, (status, corpo)) in enumerate(zip(custos, respostas)):
+        esperado = analise.calcular_preco_venda(custo, custo_fixo, configuracao)
+        assert status == 200 and corpo['nome'] == f'Produto {i}'
+        assert np.isclose(corpo['preco_venda_unitario'], esperado['preco_venda_unitario'])
+
+    assert lote[0] == 200 and len(lote[1]['produtos']) == 2
+    assert erro[0] == 400 and 'custo' in erro[1]['erro']
+    assert inexistente[0] == 404
+
+    status, corpo = metricas
+    assert status == 200
+    assert corpo['requisicoes'] == 12 and corpo['produtos'] == 12
+    # As dez requisições simultâneas foram calculadas em menos lotes do que requisições
+    assert corpo['lotes'] < 11
+    assert corpo['fila'] == 0
+    assert corpo['latencia_ms']['p50'] <= corpo['latencia_ms']['p99']
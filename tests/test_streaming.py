@@ -0,0 +1,57 @@
+import os
+import tempfile
+import pandas as pd
+from openpyxl import load_workbook
+
+from analise_financeira import AnaliseFinanceira
+
+
+def _produtos_exemplo():
+    return pd.DataFrame({
+        'Nome_Produto': [f'Produto {i}' for i in range(25)] + ['Sem custo'],
+        'Custo_Compra': [2.0 + i for i in range(25)] + ['abc'],
+        'Quantidade': [i % 4 + 1 for i in range(25)] + [3],
+    })
+
+
+def _analise():
+    analise = AnaliseFinanceira()
+    analise.definir_custos_fixos({'aluguel': 900.0, 'salario': 1500.0})
+    analise.definir_margem_lucro(0.3)
+    return analise
+
+
+def test_streaming_csv_igual_ao_calculo_em_memoria():
+    with tempfile.TemporaryDirectory() as pasta:
+        entrada = os.path.join(pasta, 'compras.csv')
+        saida = os.path.join(pasta, 'precos.csv')
+        _produtos_exemplo().to_csv(entrada, index=False)
+
+        analise = _analise()
+        relatorio = analise.precificar_arquivo_streaming(entrada, saida, tamanho_bloco=7)
+
+        analise.produtos = analise._validar_produtos(_produtos_exemplo())
+        esperado = analise.calcular_preco_lote()
+        obtido = pd.read_csv(saida)
+
+        assert list(obtido.columns) == list(esperado.columns)
+        pd.testing.assert_series_equal(obtido['preco_venda_unitario'], esperado['preco_venda_unitario'])
+        assert relatorio['total_produtos_diferentes'] == len(esperado)
+        assert abs(relatorio['lucro_total_estimado'] - esperado['lucro_total'].sum()) < 1e-9
+
+
+def test_streaming_xlsx_gera_tres_planilhas():
+    with tempfile.TemporaryDirectory() as pasta:
+        entrada = os.path.join(pasta, 'compras.xlsx')
+        saida = os.path.join(pasta, 'relatorio.xlsx')
+        _produtos_exemplo().to_excel(entrada, index=False)
+
+        analise = _analise()
+        analise.precificar_arquivo_streaming(entrada, saida, tamanho_bloco=10)
+
+        wb = load_workbook(saida, read_only=True)
+        assert wb.sheetnames == ['Analise_Produtos', 'Resumo_Financeiro', 'Custos_Fixos']
+        linhas = list(wb['Analise_Produtos'].iter_rows(values_only=True))
+        assert len(linhas) == 2 + 25
+        assert linhas[2][0] == 'Produto 0'
+        wb.close()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+from analise_financeira import AnaliseFinanceira, converter_numeros_br
+
+
+def test_converter_numeros_no_formato_brasileiro():
+    valores = pd.Series(['R$ 1.234,56', '12,50', '-R$ 3,5', '1.234.567', '12.5', 'abc', '1.23,4', None])
+    convertidos = converter_numeros_br(valores)
+    np.testing.assert_allclose(convertidos[:5], [1234.56, 12.5, -3.5, 1234567.0, 12.5])
+    assert convertidos[5:].isna().all()
+
+    # Colunas mistas (como as lidas do Excel) e já numéricas
+    misto = converter_numeros_br(pd.Series([7.25, '8,75', 3], dtype=object))
+    np.testing.assert_allclose(misto, [7.25, 8.75, 3.0])
+    numerico = pd.Series([1.5, 2.5])
+    assert converter_numeros_br(numerico) is numerico
+
+
+def test_pontos_de_milhar_e_tipos_de_texto():
+    # Pontos de milhar valem do mesmo jeito com ou sem "R$"; "12.5" e "0.500" são decimais
+    valores = ['1.234', 'R$ 1.234', '1.234.567', '-1.234', '12.5', '0.500']
+    esperado = [1234.0, 1234.0, 1234567.0, -1234.0, 12.5, 0.5]
+    for tipo in ['str', 'string', 'string[pyarrow]', object]:
+        convertidos = converter_numeros_br(pd.Series(valores + ['abc'], dtype=tipo))
+        assert convertidos.dtype == np.float64
+        np.testing.assert_allclose(convertidos[:6], esperado)
+        assert np.isnan(convertidos.iloc[6])
+
+
+def test_carga_aceita_formato_brasileiro_e_relata_rejeitados():
+    with tempfile.TemporaryDirectory() as pasta:
+        planilha = os.path.join(pasta, 'compras.xlsx')
+        pd.DataFrame({
+            'Nome_Produto': ['Arroz', 'Feijão', 'Óleo', 'Leite', 'Café'],
+            'Custo_Compra': ['R$ 1.234,56', '12,50', 'sem preço', None, 4.5],
+            'Quantidade': [10, '2', 'duas', 3, None],
+        }).to_excel(planilha, index=False)
+
+        for usar_cache in (False, True, True):
+            analise = AnaliseFinanceira()
+            if usar_cache:
+                analise.ativar_cache(os.path.join(pasta, 'cache'))
+            df = analise.carregar_produtos_excel(planilha)
+
+            assert list(df['Nome_Produto']) == ['Arroz', 'Feijão', 'Café']
+            np.testing.assert_allclose(df['Custo_Compra'], [1234.56, 12.5, 4.5])
+            np.testing.assert_allclose(df['Quantidade'], [10, 2, 1])
+
+            relatorio = analise.relatorio_validacao
+            assert list(relatorio.columns) == ['linha', 'coluna', 'valor_original', 'motivo']
+            assert list(zip(relatorio['linha'], relatorio['coluna'])) == [
+                (2, 'Custo_Compra'), (2, 'Quantidade'), (3, 'Custo_Compra'), (4, 'Quantidade')
+            ]
+            assert relatorio['valor_original'].iloc[0] == 'sem preço'
+            assert relatorio['motivo'].iloc[2] == 'vazio; linha descartada'
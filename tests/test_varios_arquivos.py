@@ -0,0 +1,53 @@
+import multiprocessing
+import os
+import tempfile
+import pandas as pd
+import pytest
+
+from analise_financeira import AnaliseFinanceira
+
+
+def _produtos(nomes, custo):
+    return pd.DataFrame({'Nome_Produto': nomes, 'Custo_Compra': [custo] * len(nomes), 'Quantidade': [2] * len(nomes)})
+
+
+def test_carrega_varios_arquivos_e_abas():
+    with tempfile.TemporaryDirectory() as pasta:
+        semana1 = os.path.join(pasta, 'semana1.xlsx')
+        with pd.ExcelWriter(semana1) as writer:
+            _produtos(['Arroz 5kg', 'Feijão 1kg'], 10.0).to_excel(writer, sheet_name='Mercearia', index=False)
+            _produtos(['Leite 1L'], 4.5).to_excel(writer, sheet_name='Laticínios', index=False)
+        semana2 = os.path.join(pasta, 'semana2.csv')
+        _produtos(['Café 500g'], 18.0).to_csv(semana2, index=False)
+
+        analise = AnaliseFinanceira()
+        df = analise.carregar_varios_arquivos([semana1, semana2], max_processos=2)
+
+        assert list(df['Nome_Produto']) == ['Arroz 5kg', 'Feijão 1kg', 'Leite 1L', 'Café 500g']
+        assert list(df['Arquivo_Origem']) == ['semana1.xlsx'] * 3 + ['semana2.csv']
+        assert list(df['Aba_Origem'][:3]) == ['Mercearia', 'Mercearia', 'Laticínios']
+        assert analise.calcular_preco_lote()['Quantidade'].sum() == 8
+
+
+def test_processos_iniciados_com_spawn():
+    # Como no dashboard: processos sem fork dão o mesmo resultado
+    with tempfile.TemporaryDirectory() as pasta:
+        caminhos = []
+        for i, nomes in enumerate((['Arroz 5kg'], ['Leite 1L', 'Café 500g'])):
+            caminhos.append(os.path.join(pasta, f'loja{i}.xlsx'))
+            _produtos(nomes, 5.0).to_excel(caminhos[-1], index=False)
+
+        df = AnaliseFinanceira().carregar_varios_arquivos(caminhos, max_processos=2,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+        assert list(df['Nome_Produto']) == ['Arroz 5kg', 'Leite 1L', 'Café 500g']
+
+
+def test_aba_invalida_indica_arquivo_e_aba():
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'fornecedor.xlsx')
+        with pd.ExcelWriter(caminho) as writer:
+            _produtos(['Arroz 5kg'], 10.0).to_excel(writer, sheet_name='Ok', index=False)
+            pd.DataFrame({'Produto': ['x']}).to_excel(writer, sheet_name='Errada', index=False)
+
+        with pytest.raises(Exception, match='fornecedor.xlsx \\(aba Errada\\)'):
+            AnaliseFinanceira().carregar_varios_arquivos([caminho], usar_processos=False)